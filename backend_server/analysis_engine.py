@@ -0,0 +1,88 @@
+import os, time, random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30.0"))
+
+
+# ============================================================
+# 1️⃣ 재시도 판단 (429 / 5xx / 네트워크 오류)
+# ============================================================
+def _status_code(e: Exception):
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable_error(e: Exception) -> bool:
+    status = _status_code(e)
+    if status is not None:
+        return status == 429 or status >= 500
+    # 상태 코드가 없는 연결 끊김/타임아웃
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout")
+
+
+def _retry_after(e: Exception):
+    """서버가 Retry-After 헤더를 주면 그 값을 우선 사용"""
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """지수 백오프 + full jitter"""
+    cap = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def call_with_retry(fn, *args, max_attempts: int = None, **kwargs):
+    """fn 호출, 재시도 가능한 오류면 백오프 후 다시 시도 (마지막 오류는 그대로 raise)"""
+    max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    for attempt in range(max_attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_retryable_error(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            print(f"🔁 재시도 {attempt + 1}/{max_attempts - 1} ({_status_code(e) or type(e).__name__}) → {delay:.1f}s 대기")
+            time.sleep(delay)
+
+
+# ============================================================
+# 2️⃣ 동시 실행 (입력 순서 유지)
+# ============================================================
+def map_concurrent(fn, items: list, max_workers: int = None, on_done=None) -> list:
+    """
+    items 각각에 fn을 스레드 풀에서 실행, 결과는 입력 순서대로 반환.
+    on_done(완료 개수, 전체 개수)는 항목이 끝날 때마다 호출 (진행률 보고용)
+    """
+    max_workers = max(1, max_workers or ANALYSIS_CONCURRENCY)
+    total = len(items)
+    if max_workers == 1 or total <= 1:
+        results = []
+        for item in items:
+            results.append(fn(item))
+            if on_done:
+                on_done(len(results), total)
+        return results
+
+    results = [None] * total
+    with ThreadPoolExecutor(max_workers=min(max_workers, total)) as pool:
+        futures = {pool.submit(fn, item): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_done:
+                on_done(done, total)
+    return results
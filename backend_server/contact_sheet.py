@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+CONTACT_SHEET_THUMB_HEIGHT = int(os.getenv("CONTACT_SHEET_THUMB_HEIGHT", "320"))
+# 한 줄에 놓을 최대 컷 수 (넘으면 다음 줄로)
+CONTACT_SHEET_COLUMNS = int(os.getenv("CONTACT_SHEET_COLUMNS", "10"))
+PADDING = 8
+LABEL_HEIGHT = 28
+BACKGROUND = (24, 24, 24)
+LABEL_COLOR = (235, 235, 235)
+
+
+# ============================================================
+# 1️⃣ 컷 썸네일 스트립
+# ============================================================
+def build_contact_sheet(
+    frames: list, output_path: str, thumb_height: int = CONTACT_SHEET_THUMB_HEIGHT,
+    columns: int = CONTACT_SHEET_COLUMNS
+) -> str:
+    """
+    [(RGB 프레임 ndarray, 라벨), ...] → 컷 순서대로 이어 붙인 썸네일 JPEG (경로 반환).
+    라벨은 컷 번호/시각처럼 ASCII만 쓰므로 한글 폰트 없이 기본 폰트로 그림
+    """
+    thumbs = []
+    for frame, label in frames:
+        img = Image.fromarray(np.asarray(frame, dtype=np.uint8)).convert("RGB")
+        width = max(1, round(img.width * thumb_height / img.height))
+        thumbs.append((img.resize((width, thumb_height), Image.BILINEAR), label))
+    if not thumbs:
+        return None
+
+    columns = max(1, min(columns, len(thumbs)))
+    rows = -(-len(thumbs) // columns)
+    cell_w = max(t.width for t, _ in thumbs) + PADDING
+    cell_h = thumb_height + LABEL_HEIGHT + PADDING
+    sheet = Image.new("RGB", (cell_w * columns + PADDING, cell_h * rows + PADDING), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default(LABEL_HEIGHT - 10)
+
+    for n, (thumb, label) in enumerate(thumbs):
+        x = PADDING + (n % columns) * cell_w
+        y = PADDING + (n // columns) * cell_h
+        sheet.paste(thumb, (x, y))
+        draw.text((x, y + thumb_height + 4), label, font=font, fill=LABEL_COLOR)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    sheet.save(tmp_path, format="JPEG", quality=85)
+    os.replace(tmp_path, output_path)
+    print(f"🗂️ 컷 썸네일 {len(thumbs)}개 → {output_path}")
+    return output_path
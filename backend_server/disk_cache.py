@@ -0,0 +1,115 @@
+import os, json, time, sqlite3, hashlib, threading
+from contextlib import contextmanager
+
+
+# ============================================================
+# 1️⃣ 캐시 키 유틸
+# ============================================================
+def make_cache_key(*parts) -> str:
+    """여러 구성 요소(파일 해시, 프롬프트, 모델 등)를 하나의 sha256 키로 합침"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 2️⃣ SQLite 기반 디스크 캐시
+# ============================================================
+class DiskCache:
+    """
+    key → JSON 값을 저장하는 영구 캐시.
+    - max_age_sec: 마지막 저장 이후 이 시간이 지나면 만료 (0이면 무제한)
+    - max_entries: 항목 수가 넘으면 가장 오래 사용되지 않은 항목부터 삭제 (LRU)
+    - max_bytes: 저장된 값의 총 크기가 넘으면 LRU 순으로 삭제 (0이면 무제한)
+    여러 프로세스/스레드에서 같은 파일을 열어도 되도록 호출마다 짧게 커넥션을 사용합니다.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, max_age_sec: float = 0, max_bytes: int = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_sec = max_age_sec
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        """캐시된 값 반환, 없거나 만료되었으면 None"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.max_age_sec and now - created > self.max_age_sec:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value) -> None:
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, len(raw.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float) -> None:
+        """만료 항목 삭제 후 개수/용량 한도를 LRU 순서로 맞춤"""
+        if self.max_age_sec:
+            conn.execute("DELETE FROM cache WHERE created < ?", (now - self.max_age_sec,))
+
+        if self.max_entries:
+            count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    " SELECT key FROM cache ORDER BY accessed ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims = []
+                for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed ASC").fetchall():
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
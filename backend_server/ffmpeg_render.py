@@ -0,0 +1,193 @@
+import os, json, subprocess, tempfile
+from subtitle_render import subtitle_png, style_for_width
+from schemas import RenderItem
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+FFMPEG_PRESET = os.getenv("FFMPEG_PRESET", "fast")
+
+# MoviePy 백엔드와 같은 연출 값
+VIDEO_FADE_SEC = 0.2
+IMAGE_FADE_SEC = 0.3
+SUBTITLE_BOTTOM_OFFSET = 150
+
+
+# ============================================================
+# 1️⃣ Helper Functions
+# ============================================================
+def probe(path: str) -> tuple:
+    """(오디오 스트림 유무, 길이(초) 또는 None) — ffprobe 1회"""
+    try:
+        out = subprocess.run(
+            [FFPROBE_BINARY, "-v", "error", "-show_entries", "format=duration:stream=codec_type",
+             "-of", "json", path],
+            capture_output=True, text=True, timeout=30,
+        )
+        info = json.loads(out.stdout or "{}")
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return False, None
+    has_audio = any(s.get("codec_type") == "audio" for s in info.get("streams", []))
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    return has_audio, duration
+
+
+def in_point(item: RenderItem, source_duration, length: float) -> float:
+    """source_start를 원본 길이 안으로 보정 (movie._in_point와 같은 규칙)"""
+    start = max(0.0, item.source_start or 0.0)
+    if source_duration:
+        start = min(start, max(0.0, source_duration - length))
+    return start
+
+
+# ============================================================
+# 2️⃣ filter_complex 구성
+# ============================================================
+def build_ffmpeg_command(
+    items: list, output_path: str, workdir: str, resolution=(1080, 1920), fps=30,
+    audio: bool = True, length: float = None, preset: str = None, transitions: bool = True, frames: int = None
+) -> tuple:
+    """
+    collect_renderable() 결과 → (ffmpeg 인자 리스트, 전체 길이)
+    audio=False면 영상 트랙만, length를 주면 출력 길이를 그 값으로 고정 (구간 렌더링용)
+    frames: 출력 프레임 수 고정 (-frames:v, 구간 렌더링에서 이어 붙일 때 프레임이 늘지 않도록)
+    preset: x264 프리셋 (None이면 FFMPEG_PRESET), transitions=False면 fade-in 없이 바로 전환 (초안용)
+    - 검은 배경(color) 위에 video/image를 start 순서대로 overlay (enable 구간 = start~end)
+    - 각 컷은 scale + setsar=1 (MoviePy resize와 같이 출력 해상도로 맞춤),
+      비율 유지 scale(force_original_aspect_ratio=decrease) + pad는 일부러 쓰지 않음:
+      MoviePy 백엔드가 resize(resolution)로 늘려 맞추므로 같은 타임라인이 백엔드마다
+      다르게 보이지 않도록(구간 캐시/초안 비교 포함) 9:16이 아닌 원본도 똑같이 늘려 채움
+      alpha fade-in으로 아래 화면 위에 겹쳐 나타남 (MoviePy crossfadein과 동일)
+    - subtitle: subtitle_render로 만든 PNG(캐시)를 하단 150px 위치에 overlay
+      (drawtext를 쓰지 않으므로 MoviePy 백엔드와 글꼴/줄바꿈/외곽선이 같음)
+    - audio: adelay로 시작 위치 맞춘 뒤 amix (audio 항목이 없으면 영상 클립 소리 사용)
+    """
+    W, H = resolution
+    subtitle_y = H - round(SUBTITLE_BOTTOM_OFFSET * H / 1920)
+    visuals = [i for i in items if i.type in ("video", "image")]
+    subtitles = [i for i in items if i.type == "subtitle"]
+    audios = [i for i in items if i.type == "audio" and i.path]
+    total = length if length is not None else max((i.end for i in visuals + subtitles), default=0.0)
+
+    inputs, filters = [], []
+    filters.append(f"color=c=black:s={W}x{H}:r={fps}:d={total:.3f}[base]")
+
+    last = "base"
+    audio_sources = []   # (입력 번호, 시작 시각, 길이)
+    for n, item in enumerate(visuals):
+        start, end = item.start, item.end
+        duration = max(0.1, end - start)
+        idx = len(inputs)
+        if item.type == "video":
+            has_audio, source_duration = probe(item.path)
+            seek = in_point(item, source_duration, duration)
+            inputs.append(["-ss", f"{seek:.3f}", "-t", f"{duration:.3f}", "-i", item.path])
+            fade = VIDEO_FADE_SEC
+            if has_audio:
+                audio_sources.append((idx, start, duration))
+        else:
+            inputs.append(["-loop", "1", "-framerate", str(fps), "-t", f"{duration:.3f}", "-i", item.path])
+            fade = IMAGE_FADE_SEC
+        fade_filter = f"fade=t=in:st=0:d={fade}:alpha=1," if transitions else ""
+        filters.append(
+            f"[{idx}:v]trim=duration={duration:.3f},setpts=PTS-STARTPTS,scale={W}:{H},setsar=1,fps={fps},"
+            f"format=yuva420p,{fade_filter}setpts=PTS+{start:.3f}/TB[v{n}]"
+        )
+        filters.append(
+            f"[{last}][v{n}]overlay=0:0:eof_action=pass:enable='between(t,{start:.3f},{end:.3f})'[o{n}]"
+        )
+        last = f"o{n}"
+
+    for n, item in enumerate(subtitles):
+        start, end = item.start, item.end
+        idx = len(inputs)
+        inputs.append(["-loop", "1", "-framerate", str(fps), "-t", f"{max(0.1, end - start):.3f}",
+                       "-i", subtitle_png(str(item.text), width=W, **style_for_width(W))])
+        filters.append(f"[{idx}:v]format=rgba,setpts=PTS-STARTPTS+{start:.3f}/TB[t{n}]")
+        filters.append(
+            f"[{last}][t{n}]overlay=x=(W-w)/2:y={subtitle_y}:eof_action=pass:"
+            f"enable='between(t,{start:.3f},{end:.3f})'[s{n}]"
+        )
+        last = f"s{n}"
+    filters.append(f"[{last}]format=yuv420p[vout]")
+
+    # audio 항목이 있으면 그것만 사용 (MoviePy 경로의 set_audio와 동일), 없으면 영상 클립 소리 합성
+    if not audio:
+        audio_sources = []
+    elif audios:
+        audio_sources = []
+        for item in audios:
+            duration = max(0.1, item.end - item.start)
+            audio_sources.append((len(inputs), item.start, duration))
+            seek = in_point(item, probe(item.path)[1], duration) if item.source_start else 0.0
+            inputs.append(["-ss", f"{seek:.3f}", "-t", f"{duration:.3f}", "-i", item.path])
+
+    audio_labels = []
+    for n, (idx, start, duration) in enumerate(audio_sources):
+        delay = int(round(start * 1000))
+        filters.append(
+            f"[{idx}:a]atrim=duration={duration:.3f},asetpts=PTS-STARTPTS,adelay={delay}:all=1[a{n}]"
+        )
+        audio_labels.append(f"[a{n}]")
+    if len(audio_labels) > 1:
+        filters.append(f"{''.join(audio_labels)}amix=inputs={len(audio_labels)}:duration=longest:normalize=0[aout]")
+    elif audio_labels:
+        filters.append(f"{audio_labels[0]}anull[aout]")
+
+    script_path = os.path.join(workdir, "filter_complex.txt")
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(";\n".join(filters))
+
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-nostats", "-progress", "pipe:1"]
+    for args in inputs:
+        cmd += args
+    cmd += ["-filter_complex_script", script_path, "-map", "[vout]"]
+    if audio_labels:
+        cmd += ["-map", "[aout]", "-c:a", "aac"]
+    cmd += [
+        "-c:v", "libx264", "-preset", preset or FFMPEG_PRESET, "-pix_fmt", "yuv420p", "-r", str(fps),
+        "-t", f"{total:.3f}",
+    ]
+    if frames is not None:
+        cmd += ["-frames:v", str(frames)]
+    cmd += ["-movflags", "+faststart", output_path]
+    return cmd, total
+
+
+# ============================================================
+# 3️⃣ 실행 (진행률: -progress 출력의 out_time)
+# ============================================================
+def render_with_ffmpeg(
+    items: list, output_path: str, resolution=(1080, 1920), fps=30, progress=None,
+    audio: bool = True, length: float = None, preset: str = None, transitions: bool = True, frames: int = None
+) -> None:
+    """검증된 타임라인 항목을 ffmpeg 명령 하나로 렌더링 (실패 시 ffmpeg 로그 끝부분과 함께 RuntimeError)"""
+    progress = progress or (lambda *args: None)
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix=".ffmpeg_", dir=out_dir) as workdir:
+        cmd, total = build_ffmpeg_command(
+            items, output_path, workdir, resolution, fps, audio, length, preset, transitions, frames
+        )
+        log_path = os.path.join(workdir, "ffmpeg.log")
+        print(f"\n📦 ffmpeg 렌더링 시작 → {output_path} ({total:.1f}s)")
+
+        with open(log_path, "w", encoding="utf-8", errors="replace") as log:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log, text=True)
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                if key == "out_time_us" and value.isdigit() and total > 0:
+                    seconds = int(value) / 1_000_000
+                    progress("render", min(99.0, 100 * seconds / total), f"{seconds:.1f}/{total:.1f}s")
+            code = proc.wait()
+
+        if code != 0:
+            with open(log_path, encoding="utf-8", errors="replace") as f:
+                tail = f.read()[-2000:]
+            raise RuntimeError(f"ffmpeg 렌더링 실패 (exit {code}):\n{tail}")
@@ -1,5 +1,8 @@
 import os
+import hashlib
+import threading
 import subprocess
+from collections import OrderedDict
 
 # 확장자 판별
 def check_file_type(file_path: str):
@@ -11,6 +14,38 @@ def check_file_type(file_path: str):
     else:
         return "unknown"
     
+# 파일 내용 해시 (캐시 키용)
+# 업로드 중 이미 계산한 해시는 (경로, 크기, 수정시각) 기준으로 기억해 다시 읽지 않음
+# 서버 프로세스가 오래 떠 있어도 커지지 않도록 최근 사용한 _KNOWN_HASHES_MAX개만 유지 (LRU)
+_KNOWN_HASHES_MAX = 4096
+_known_hashes = OrderedDict()
+_known_hashes_lock = threading.Lock()
+
+def _hash_key(file_path: str):
+    st = os.stat(file_path)
+    return (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+
+def remember_file_hash(file_path: str, digest: str) -> None:
+    key = _hash_key(file_path)
+    with _known_hashes_lock:
+        _known_hashes[key] = digest
+        _known_hashes.move_to_end(key)
+        while len(_known_hashes) > _KNOWN_HASHES_MAX:
+            _known_hashes.popitem(last=False)
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    key = _hash_key(file_path)
+    with _known_hashes_lock:
+        if key in _known_hashes:
+            _known_hashes.move_to_end(key)
+            return _known_hashes[key]
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    remember_file_hash(file_path, h.hexdigest())
+    return h.hexdigest()
+
 def extract_audio(file_path: str, audio_path: str = "temp.wav") -> str:
     file_type = check_file_type(file_path)
 
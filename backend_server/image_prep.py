@@ -0,0 +1,102 @@
+import os, io, math, base64, mimetypes
+from PIL import Image, ImageOps
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+# OpenAI Vision(detail=high)은 2048px 안에 맞춘 뒤 짧은 변을 768px로 줄여서 봅니다.
+# 그보다 큰 해상도는 업로드 용량만 늘리고 분석 품질에는 영향이 없습니다.
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "2048"))
+VISION_SHORT_SIDE = int(os.getenv("VISION_SHORT_SIDE", "768"))
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()  # JPEG | WEBP
+VISION_TARGET_KB = int(os.getenv("VISION_TARGET_KB", "300"))
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+_QUALITY_STEPS = (85, 75, 65, 55, 45)
+
+# 분석 캐시 키에 포함하는 전처리 설정 (바뀌면 모델이 본 입력이 달라지므로 이전 분석을 재사용하지 않음)
+VISION_PREP_SETTINGS = {
+    "max_side": VISION_MAX_SIDE,
+    "short_side": VISION_SHORT_SIDE,
+    "format": VISION_IMAGE_FORMAT,
+    "target_kb": VISION_TARGET_KB,
+    "quality_steps": _QUALITY_STEPS,
+}
+
+
+# ============================================================
+# 1️⃣ 리사이즈 & 재인코딩
+# ============================================================
+def vision_size(width: int, height: int) -> tuple:
+    """Vision 모델이 실제로 사용하는 해상도로 축소한 크기 (확대는 하지 않음)"""
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height), VISION_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    """투명 배경(PNG 등)은 흰 배경에 합성, 나머지는 RGB로 변환"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        bg = Image.new("RGB", rgba.size, (255, 255, 255))
+        bg.paste(rgba, mask=rgba.getchannel("A"))
+        return bg
+    return img.convert("RGB")
+
+
+def encode_for_vision(img: Image.Image) -> tuple:
+    """이미지를 축소 후 목표 용량 이하가 될 때까지 품질을 낮춰 인코딩 → (bytes, mime)"""
+    img = _to_rgb(img)
+    size = vision_size(*img.size)
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+
+    fmt = VISION_IMAGE_FORMAT if VISION_IMAGE_FORMAT in _MIME else "JPEG"
+    target = VISION_TARGET_KB * 1024
+    data = b""
+    for quality in _QUALITY_STEPS:
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, quality=quality)
+        data = buf.getvalue()
+        if len(data) <= target:
+            break
+    return data, _MIME[fmt]
+
+
+def to_data_url(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+# ============================================================
+# 2️⃣ 입력별 진입점 (이미지 파일 / 영상 프레임)
+# ============================================================
+def load_image_for_vision(path: str) -> tuple:
+    """이미지 파일 → (Vision 요청용 data URL, 전송 해상도) (EXIF 회전 반영)"""
+    try:
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img)
+            size = vision_size(*img.size)
+            data, mime = encode_for_vision(img)
+        return to_data_url(data, mime), size
+    except Exception as e:
+        # Pillow로 열 수 없는 형식이면 원본 그대로, MIME은 확장자로 추정
+        print(f"⚠️ 이미지 전처리 실패, 원본 사용: {path} ({e})")
+        mime = mimetypes.guess_type(path)[0] or "image/jpeg"
+        with open(path, "rb") as f:
+            return to_data_url(f.read(), mime), (VISION_MAX_SIDE, VISION_MAX_SIDE)
+
+
+def prepare_image_file(path: str) -> str:
+    """이미지 파일 → Vision 요청용 data URL"""
+    return load_image_for_vision(path)[0]
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """OpenAI Vision(detail=high) 이미지 입력 토큰 추정: 85 + 512px 타일당 170"""
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def prepare_frame(frame_bgr) -> str:
+    """OpenCV(BGR) 프레임 → Vision 요청용 data URL"""
+    data, mime = encode_for_vision(Image.fromarray(frame_bgr[:, :, ::-1]))
+    return to_data_url(data, mime)
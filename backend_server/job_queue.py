@@ -0,0 +1,258 @@
+import os, json, time, sqlite3, threading, traceback, multiprocessing
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from workspace import get_workspace
+from progress import ProgressReporter
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+# 작업 공간(workspaces/)은 결과 파일 서비스 경로 아래에 있으므로 DB는 그 밖에 둠
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("data", "jobs.sqlite"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# 워커 프로세스 1개가 처리할 최대 작업 수 (MoviePy/ffmpeg 리소스 누수 방지용 재시작 주기)
+JOB_MAX_TASKS_PER_WORKER = int(os.getenv("JOB_MAX_TASKS_PER_WORKER", "20"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+# ============================================================
+# 1️⃣ SQLite 작업 상태 저장소 (서버/워커 프로세스 공용)
+# ============================================================
+class JobStore:
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " params TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " created REAL NOT NULL,"
+                " started REAL,"
+                " finished REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " job_id TEXT NOT NULL,"
+                " ts REAL NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events(job_id, id)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, params: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, created) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params, ensure_ascii=False), time.time()),
+            )
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def ids_with_status(self, *statuses) -> list:
+        marks = ",".join("?" * len(statuses))
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT id FROM jobs WHERE status IN ({marks}) ORDER BY created", statuses)
+            return [r["id"] for r in rows.fetchall()]
+
+    def add_event(self, job_id: str, data: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, ts, data) VALUES (?, ?, ?)",
+                (job_id, time.time(), json.dumps(data, ensure_ascii=False)),
+            )
+
+    def events_since(self, job_id: str, last_id: int = 0) -> list:
+        """last_id 이후의 진행 이벤트 [{id, ts, ...data}]"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, ts, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                (job_id, last_id),
+            ).fetchall()
+        return [{"id": r["id"], "ts": r["ts"], **json.loads(r["data"])} for r in rows]
+
+    def latest_event(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, ts, data FROM job_events WHERE job_id = ? ORDER BY id DESC LIMIT 1", (job_id,)
+            ).fetchone()
+        return {"id": row["id"], "ts": row["ts"], **json.loads(row["data"])} if row else None
+
+    def requeue(self, job_id: str, params: dict, status: str, finished: float) -> bool:
+        """
+        끝난 작업을 새 파라미터로 다시 대기 상태로 (초안 승인 후 본 렌더링 등).
+        조회했을 때의 상태(status, finished)가 그대로일 때만 바꾸는 조건부 UPDATE →
+        동시에 들어온 요청 중 하나만 성공 (반환: 성공 여부).
+        이전 결과(초안 경로/draft 표시)는 새 결과가 저장될 때까지 그대로 둠
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, params = ?, error = NULL, finished = NULL"
+                " WHERE id = ? AND status = ? AND finished IS ?",
+                (QUEUED, json.dumps(params, ensure_ascii=False), job_id, status, finished),
+            )
+            return cur.rowcount == 1
+
+    def delete(self, job_ids: list) -> None:
+        """작업 공간과 함께 정리된 작업의 상태 행과 진행 이벤트 삭제"""
+        if not job_ids:
+            return
+        marks = ",".join("?" * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM job_events WHERE job_id IN ({marks})", tuple(job_ids))
+            conn.execute(f"DELETE FROM jobs WHERE id IN ({marks})", tuple(job_ids))
+
+    def mark_running(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+
+    def mark_done(self, job_id: str, result: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ?",
+                (DONE, json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id),
+            )
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+
+# ============================================================
+# 2️⃣ 워커 프로세스에서 실행되는 작업 함수
+# ============================================================
+def run_job(job_id: str, db_path: str = JOB_DB_PATH) -> None:
+    store = JobStore(db_path)
+    job = store.get(job_id)
+    ws = get_workspace(job_id)
+    if job is None or ws is None:
+        print(f"⚠️ 작업 또는 작업 공간 없음: {job_id}")
+        return
+
+    store.mark_running(job_id)
+    print(f"🏃 작업 시작 [{job_id}]")
+    params = dict(job["params"])
+    upload_sec = params.pop("upload_sec", None)
+    queued_at = params.pop("queued_at", None)
+    # 경과 시간은 업로드 시작부터, 다시 대기열에 넣은 작업(초안 승인 등)은 그 시각부터 계산
+    started = queued_at or job["created"] - (upload_sec or 0)
+    progress = ProgressReporter(job_id, store, started=started)
+    try:
+        # 무거운 모듈(OpenAI/LangChain/MoviePy)은 워커 프로세스에서만 import
+        from main import run_job_pipeline
+        result = run_job_pipeline(ws, progress=progress, **params)
+        timings = dict(progress.timings)
+        if upload_sec is not None and queued_at is None:
+            # 업로드는 서버 프로세스에서 측정해 params로 전달됨
+            timings = {"upload": upload_sec, **timings}
+        result["timings"] = timings
+        store.mark_done(job_id, result)
+        print(f"✅ 작업 완료 [{job_id}]")
+    except Exception as e:
+        print(f"❌ 작업 실패 [{job_id}]:", traceback.format_exc())
+        store.mark_failed(job_id, f"{e}\n{traceback.format_exc()}")
+
+
+# ============================================================
+# 3️⃣ 작업 큐 (프로세스 풀, 외부 브로커 없음)
+# ============================================================
+class JobQueue:
+    def __init__(self, store: JobStore, max_workers: int = JOB_WORKERS):
+        self.store = store
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=JOB_MAX_TASKS_PER_WORKER or None,
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """워커가 죽어 깨진(BrokenProcessPool) 풀을 새 풀로 교체 (다른 스레드가 이미 교체했으면 그대로 둠)"""
+        with self._lock:
+            if self.executor is broken:
+                print("♻️ 작업 워커 풀 재생성")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._new_executor()
+
+    def submit(self, job_id: str) -> bool:
+        """
+        작업을 워커 풀에 제출. 풀이 깨져 있으면 새로 만들어 한 번 더 시도하고,
+        그래도 실패하면 작업을 실패 처리 (반환: 제출 성공 여부)
+        """
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                future = executor.submit(run_job, job_id, self.store.path)
+            except (BrokenProcessPool, RuntimeError) as e:
+                if attempt == 0:
+                    self._restart(executor)
+                    continue
+                print(f"❌ 작업 제출 실패 [{job_id}]:", e)
+                self.store.mark_failed(job_id, f"작업 제출 실패: {e}")
+                return False
+            future.add_done_callback(partial(self._on_done, job_id))
+            return True
+        return False
+
+    def _on_done(self, job_id: str, future) -> None:
+        """
+        run_job은 자체 예외를 모두 잡으므로, 여기서 예외가 보이면 워커 프로세스가 죽은 경우
+        (OOM 등 → BrokenProcessPool). 상태가 대기/실행 중으로 남지 않게 실패 처리
+        """
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        try:
+            job = self.store.get(job_id)
+            if job is not None and job["status"] in (QUEUED, RUNNING):
+                print(f"❌ 작업 워커 비정상 종료 [{job_id}]:", error)
+                self.store.mark_failed(job_id, f"작업 워커가 비정상 종료되었습니다: {error!r}")
+        except Exception:
+            print("⚠️ 작업 실패 기록 중 오류:", traceback.format_exc())
+
+    def recover(self) -> None:
+        """서버 재시작 시: 실행 중이던 작업은 실패 처리, 대기 중이던 작업은 다시 제출"""
+        for job_id in self.store.ids_with_status(RUNNING):
+            self.store.mark_failed(job_id, "서버 재시작으로 작업이 중단되었습니다.")
+        pending = self.store.ids_with_status(QUEUED)
+        for job_id in pending:
+            self.submit(job_id)
+        if pending:
+            print(f"🔁 대기 작업 {len(pending)}개 재제출")
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
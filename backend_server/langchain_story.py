@@ -1,53 +1,20 @@
-import json, math, os
-from typing import List, Optional
-from pydantic import BaseModel, Field
+import json, os, time, asyncio
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
-from langchain_core.runnables import RunnableSequence
+from progress import no_progress
+from llm_cache import cached_chain, llm_cache
+from prompt_budget import compact_analysis
+from timeline_stream import TIMELINE_STREAM, astream_structured
+from timeline_repair import normalize_timeline
 
 
 # ============================================================
-# 1️⃣ Pydantic Schemas
+# 1️⃣ Pydantic Schemas (schemas.py, 기존 import 경로 호환을 위해 다시 내보냄)
 # ============================================================
-class SceneItem(BaseModel):
-    scene_id: int
-    summary: str
-    highlight: str
-
-
-class ScenesOutput(BaseModel):
-    scenes: List[SceneItem] = Field(default_factory=list)
-
-
-class StoryIdeaOutput(BaseModel):
-    tone: str
-    opening: str
-    development: str
-    closing: str
-    key_message: str
-    opening_sec: int
-    development_sec: int
-    closing_sec: int
-
-
-class TimelineItem(BaseModel):
-    type: str
-    filename: Optional[str] = None
-    text: Optional[str] = None
-    start: float
-    end: float
-
-
-class TimelineOutput(BaseModel):
-    story_summary: str
-    timeline: List[TimelineItem]
-
-class EmotionOutput(BaseModel):
-    emotion_story: str
-
-class HookOutput(BaseModel):
-    hook_line: str
+from schemas import (  # noqa: F401
+    SceneItem, ScenesOutput, StoryIdeaOutput, TimelineItem, TimelineOutput, EmotionOutput, HookOutput,
+    split_duration,
+)
 
 
 # ============================================================
@@ -72,18 +39,6 @@ def story_to_json(obj: StoryIdeaOutput) -> str:
     return json.dumps(obj.model_dump(), ensure_ascii=False, indent=2)
 
 
-def split_duration(total: int) -> dict:
-    """총 길이를 도입, 전개, 결말로 분할"""
-    opening = int(total * 0.3)
-    development = int(total * 0.5)
-    closing = total - opening - development
-    return {
-        "opening_sec": opening,
-        "development_sec": development,
-        "closing_sec": closing
-    }
-
-
 # ============================================================
 #  Debuging Functions
 # ============================================================
@@ -179,11 +134,11 @@ emotion_prompt = ChatPromptTemplate.from_messages([
 - 인물의 감정과 상황을 구체적으로 묘사
 - 감동, 유머, 긴장 중 하나 이상 포함
 - 너무 설명적이지 말고 자연스럽게 풀어내세요.
-
+{variant_hint}
 출력 형식(JSON):
 {{ "emotion_story": "..." }}
 """)
-])
+]).partial(variant_hint="")
 
 # ⚡ 3초 후킹 문장 생성
 hook_prompt = ChatPromptTemplate.from_messages([
@@ -198,11 +153,11 @@ hook_prompt = ChatPromptTemplate.from_messages([
 - 12자 이내, 강렬하거나 의문형
 - 단조로운 설명 금지
 - 감정/반전/놀라움 중 하나 포함
-
+{variant_hint}
 출력 형식(JSON):
 {{ "hook_line": "..." }}
 """)
-])
+]).partial(variant_hint="")
 
 # 🧩 Timeline 생성
 timeline_prompt = ChatPromptTemplate.from_messages([
@@ -242,7 +197,9 @@ timeline_prompt = ChatPromptTemplate.from_messages([
 7) 필요할 경우 subtitle은 영상 중간에도 여러 번 나올 수 있음
 8) 오디오(audio)는 전체 영상에 걸쳐 1개만 포함
 9) 각 컷은 3~7초 사이로 구성
-10) JSON은 다음 형식이어야 함:
+10) 같은 영상을 여러 번 사용할 때는 source_start(원본 영상 안의 시작 초)를 다르게 지정해 다른 구간을 보여줄 것
+{variant_hint}
+11) JSON은 다음 형식이어야 함:
 
 ```json
 {{
@@ -255,36 +212,24 @@ timeline_prompt = ChatPromptTemplate.from_messages([
   ]
 }}
      """)
-])
+]).partial(variant_hint="")
+
+# 🔀 변형(variant)별 연출 방향 (0번은 기본 결과와 같음 → 단일 실행 캐시 공유)
+VARIANT_HINTS = [
+    "",
+    "[변형 방향] 유머러스하고 가벼운 톤, 질문형 후킹 문장, 경쾌한 전개",
+    "[변형 방향] 감동적이고 진지한 톤, 인물의 감정을 강조하는 후킹 문장",
+    "[변형 방향] 빠른 전개: 컷을 3~4초로 짧게, 반전/놀라움형 후킹 문장",
+    "[변형 방향] 차분한 정보전달형, 숫자·사실 중심 후킹 문장, 핵심 메시지를 마지막에 강조",
+]
 
 
 # ============================================================
 # 5️⃣ Helper to ensure timeline validity
 # ============================================================
-def ensure_timeline_constraints(tl: TimelineOutput, analysis_json: dict, total: int):
-    imgs = analysis_json.get("images", [])
-    auds = analysis_json.get("audio", [])
-
-    # 필수 컷 최소 길이 보정
-    for item in tl.timeline:
-        d = item.end - item.start
-        if d < 3.0:
-            item.end = item.start + 3.0
-        elif d > 7.0:
-            item.end = item.start + 7.0
-
-    # 이미지, 오디오 필수 컷 자동 추가
-    if not any(i.type == "image" for i in tl.timeline) and imgs:
-        tl.timeline.append(TimelineItem(
-            type="image", filename=imgs[0]["filename"], start=0.0, end=3.0
-        ))
-
-    if not any(i.type == "audio" for i in tl.timeline) and auds:
-        tl.timeline.append(TimelineItem(
-            type="audio", filename=auds[0]["filename"], start=0.0, end=float(total)
-        ))
-
-    return tl
+def ensure_timeline_constraints(tl: TimelineOutput, analysis_json: dict, total: int, hook_line: str = None):
+    """timeline_repair.normalize_timeline으로 보정된 타임라인만 반환 (기존 호출부 호환용)"""
+    return normalize_timeline(tl, analysis_json, total, hook_line=hook_line)[0]
 
 
 # ============================================================
@@ -292,28 +237,12 @@ def ensure_timeline_constraints(tl: TimelineOutput, analysis_json: dict, total:
 # ============================================================
 
 def build_pipeline():
-    scene_chain = scene_prompt | scene_llm
-    story_chain = story_prompt | story_llm
-    emotion_chain = emotion_prompt | emotion_llm
-    hook_chain = hook_prompt | hook_llm
-    timeline_chain = timeline_prompt | timeline_llm
-
-    # RunnableParallel 구성
-    story_inputs = RunnableParallel(
-        scenes_json=scene_chain | RunnableLambda(lambda out: scenes_to_json(out)),
-        duration=RunnableLambda(lambda inp: int(inp.get("duration", 30))),
-        user_prompt=RunnableLambda(lambda inp: inp.get("user_prompt", "")),
-        analysis_json=RunnableLambda(lambda inp: json.dumps(inp["analysis_json"], ensure_ascii=False))
-    )
-
-    timeline_inputs = RunnableParallel(
-        analysis_json=RunnableLambda(lambda inp: json.dumps(inp["analysis_json"], ensure_ascii=False)),
-        story_idea_json=story_chain | RunnableLambda(lambda out: story_to_json(out)),
-        emotion_json=emotion_chain | RunnableLambda(lambda out: json.dumps(out, ensure_ascii=False)),
-        hook_json=hook_chain | RunnableLambda(lambda out: json.dumps(out, ensure_ascii=False)),
-        duration=RunnableLambda(lambda inp: int(inp.get("duration", 30))),
-    )
-
+    # 각 체인 앞단에 디스크 캐시 (같은 프롬프트 재실행 시 LLM 호출 생략)
+    scene_chain = cached_chain("scene", scene_prompt, scene_llm, ScenesOutput, base_llm)
+    story_chain = cached_chain("story", story_prompt, story_llm, StoryIdeaOutput, base_llm)
+    emotion_chain = cached_chain("emotion", emotion_prompt, emotion_llm, EmotionOutput, base_llm)
+    hook_chain = cached_chain("hook", hook_prompt, hook_llm, HookOutput, base_llm)
+    timeline_chain = cached_chain("timeline", timeline_prompt, timeline_llm, TimelineOutput, base_llm)
 
     return {
         "scene_chain": scene_chain,
@@ -321,60 +250,288 @@ def build_pipeline():
         "emotion_chain": emotion_chain, 
         "hook_chain": hook_chain,
         "timeline_chain": timeline_chain,
-        "story_inputs": story_inputs,
-        "timeline_inputs": timeline_inputs
     }
 
 
+# 체인/ChatOpenAI 클라이언트는 프로세스당 한 번만 구성
+_PIPELINE = None
+
+
+def get_pipeline():
+    global _PIPELINE
+    if _PIPELINE is None:
+        _PIPELINE = build_pipeline()
+    return _PIPELINE
+
+
 # ============================================================
 # 7️⃣ 최종 실행 함수
 # ============================================================
+# true면 ainvoke 기반 DAG 실행 (emotion/hook 동시 실행), false면 기존 순차 invoke
+PIPELINE_ASYNC = os.getenv("PIPELINE_ASYNC", "true").lower() == "true"
 
-def run_openai_pipeline(analysis_json: dict, duration: int, user_prompt: str):
-    chains = build_pipeline()
-    split = split_duration(duration)
+# 비동기 OpenAI 클라이언트의 연결 풀은 이벤트 루프에 묶이므로
+# asyncio.run()으로 매번 새 루프를 만들지 않고 프로세스 전체에서 같은 루프를 재사용
+_LOOP = None
 
-    # 1. 장면 분석
-    scenes = chains["scene_chain"].invoke({
-        "analysis_json": json.dumps(analysis_json, ensure_ascii=False),
+
+def run_async(coro):
+    global _LOOP
+    if _LOOP is None or _LOOP.is_closed():
+        _LOOP = asyncio.new_event_loop()
+    return _LOOP.run_until_complete(coro)
+
+
+def _scene_inputs(analysis_json: dict, user_prompt: str) -> dict:
+    return {
+        "analysis_json": json.dumps(compact_analysis(analysis_json, "scenes"), ensure_ascii=False),
         "user_prompt": user_prompt
-    })
+    }
 
-    # 2. 스토리 생성
-    story = chains["story_chain"].invoke({
+
+def _story_inputs(scenes: ScenesOutput, duration: int, user_prompt: str) -> dict:
+    return {
         "scenes_json": scenes_to_json(scenes),
         "duration": duration,
         "user_prompt": user_prompt,
-        **split
-    })
+        **split_duration(duration)
+    }
 
-    # 2.5 감정 및 후킹 생성
-    emotion = chains["emotion_chain"].invoke({
-        "story_idea_json": story_to_json(story)
-    })
-    
-    hook = chains["hook_chain"].invoke({
-        "story_idea_json": story_to_json(story)
-    })
 
-    # 3. 타임라인 생성
-    timeline = chains["timeline_chain"].invoke({
-        "analysis_json": json.dumps(analysis_json, ensure_ascii=False),
+def _timeline_inputs(analysis_json: dict, story, emotion, hook, duration: int) -> dict:
+    return {
+        "analysis_json": json.dumps(compact_analysis(analysis_json, "timeline"), ensure_ascii=False),
         "story_idea_json": story_to_json(story),
         "emotion_json": json.dumps(emotion.model_dump(), ensure_ascii=False),
         "hook_json": json.dumps(hook.model_dump(), ensure_ascii=False),
         "duration": duration,
-    })
+    }
+
 
-    
+def _finish_timeline(
+    timeline: TimelineOutput, analysis_json: dict, duration: int, debug_dir: str, hook_line: str = None,
+    suffix: str = "", media_dir: str = None
+):
     # Debug용 타임라인 저장
-    save_debug_timeline(timeline)
+    save_debug_timeline(timeline, prefix=f"timeline_debug{suffix}", folder=debug_dir)
+
+    # 4. 타임라인 보정 (겹침/빈 구간/길이/자막 짝/후킹/누락 파일) + 보정 리포트 저장
+    # media_dir: 관련도 선택(select_relevant_media)으로 분석 결과에서 빠진 업로드 파일도 유효한 파일로 인정
+    timeline, report = normalize_timeline(timeline, analysis_json, duration, hook_line=hook_line, media_dir=media_dir)
+    save_debug_timeline(report, prefix=f"timeline_repair{suffix}", folder=debug_dir)
+    return timeline
+
+
+async def _atimeline(chains: dict, inputs: dict, on_item=None, progress=no_progress):
+    """
+    on_item이 있으면 스트리밍으로 타임라인 생성 (완성된 항목부터 on_item(dict) 호출 → 렌더 준비를 미리 시작).
+    스트리밍이 실패하면 일반 구조화 출력 호출로 다시 실행
+    """
+    if not (on_item and TIMELINE_STREAM):
+        return await chains["timeline_chain"].ainvoke(inputs)
+
+    received = 0
+
+    def handle(item: dict):
+        nonlocal received
+        received += 1
+        progress("timeline", min(95, received * 5), f"타임라인 항목 {received}개 수신")
+        on_item(item)
+
+    try:
+        return await astream_structured("timeline", timeline_prompt, base_llm, TimelineOutput, inputs, handle)
+    except Exception as e:
+        print(f"⚠️ 타임라인 스트리밍 실패, 일반 호출로 재시도: {e}")
+        return await chains["timeline_chain"].ainvoke(inputs)
 
-    # 4. 타임라인 제약 보정
-    timeline = ensure_timeline_constraints(timeline, analysis_json, duration)
 
+def _print_timings(timings: dict) -> None:
+    print("⏱️ LangChain 단계별 소요 시간: " + ", ".join(f"{k}={v}s" for k, v in timings.items()))
+    print(f"📊 LLM 캐시: {llm_cache.stats()}")
+
+
+async def arun_openai_pipeline(
+    analysis_json: dict, duration: int, user_prompt: str, debug_dir: str = "results", progress=None,
+    on_timeline_item=None, media_dir: str = None
+):
+    """
+    scenes → story → (emotion ∥ hook) → timeline 순서의 DAG를 ainvoke로 실행.
+    emotion/hook은 story에만 의존하므로 동시에 실행. 단계별 소요 시간은 timings에 기록.
+    on_timeline_item(dict): 타임라인을 스트리밍하며 항목이 완성될 때마다 호출 (미디어 미리 열기용)
+    """
+    progress = progress or no_progress
+    chains = get_pipeline()
+    timings = {}
+
+    async def timed(name, coro):
+        t0 = time.perf_counter()
+        out = await coro
+        timings[name] = round(time.perf_counter() - t0, 3)
+        return out
+
+    # 1. 장면 분석
+    progress("scenes", 0, "장면 분석 중")
+    scenes = await timed("scenes", chains["scene_chain"].ainvoke(_scene_inputs(analysis_json, user_prompt)))
+    progress("scenes", 100, f"장면 {len(scenes.scenes)}개")
+
+    # 2. 스토리 생성
+    progress("story", 0, "스토리 구성 중")
+    story = await timed("story", chains["story_chain"].ainvoke(_story_inputs(scenes, duration, user_prompt)))
+    progress("story", 100, story.tone)
+
+    # 2.5 감정 및 후킹 생성 (동시 실행)
+    progress("emotion_hook", 0, "감정 서사/후킹 문장 생성 중")
+    story_input = {"story_idea_json": story_to_json(story)}
+    t0 = time.perf_counter()
+    emotion, hook = await asyncio.gather(
+        timed("emotion", chains["emotion_chain"].ainvoke(story_input)),
+        timed("hook", chains["hook_chain"].ainvoke(story_input)),
+    )
+    timings["emotion_hook"] = round(time.perf_counter() - t0, 3)
+    progress("emotion_hook", 100, hook.hook_line)
+
+    # 3. 타임라인 생성
+    progress("timeline", 0, "타임라인 생성 중")
+    timeline = await timed("timeline", _atimeline(
+        chains, _timeline_inputs(analysis_json, story, emotion, hook, duration), on_timeline_item, progress
+    ))
+    timeline = _finish_timeline(timeline, analysis_json, duration, debug_dir, hook.hook_line, media_dir=media_dir)
+    progress("timeline", 100, f"타임라인 항목 {len(timeline.timeline)}개")
+
+    _print_timings(timings)
+    return {
+        "scenes": scenes,
+        "story": story,
+        "timeline": timeline,
+        "timings": timings
+    }
+
+
+def run_openai_pipeline(
+    analysis_json: dict, duration: int, user_prompt: str, debug_dir: str = "results", progress=None,
+    use_async: bool = PIPELINE_ASYNC, on_timeline_item=None, media_dir: str = None
+):
+    if use_async:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return run_async(arun_openai_pipeline(
+                analysis_json, duration, user_prompt, debug_dir, progress, on_timeline_item, media_dir
+            ))
+        # 이미 실행 중인 이벤트 루프 안이면 순차 실행으로 대체
+
+    progress = progress or no_progress
+    chains = get_pipeline()
+    timings = {}
+
+    def timed(name, fn, inputs):
+        t0 = time.perf_counter()
+        out = fn(inputs)
+        timings[name] = round(time.perf_counter() - t0, 3)
+        return out
+
+    # 1. 장면 분석
+    progress("scenes", 0, "장면 분석 중")
+    scenes = timed("scenes", chains["scene_chain"].invoke, _scene_inputs(analysis_json, user_prompt))
+    progress("scenes", 100, f"장면 {len(scenes.scenes)}개")
+
+    # 2. 스토리 생성
+    progress("story", 0, "스토리 구성 중")
+    story = timed("story", chains["story_chain"].invoke, _story_inputs(scenes, duration, user_prompt))
+    progress("story", 100, story.tone)
+
+    # 2.5 감정 및 후킹 생성
+    progress("emotion_hook", 0, "감정 서사/후킹 문장 생성 중")
+    story_input = {"story_idea_json": story_to_json(story)}
+    emotion = timed("emotion", chains["emotion_chain"].invoke, story_input)
+    hook = timed("hook", chains["hook_chain"].invoke, story_input)
+    progress("emotion_hook", 100, hook.hook_line)
+
+    # 3. 타임라인 생성
+    progress("timeline", 0, "타임라인 생성 중")
+    timeline = timed("timeline", chains["timeline_chain"].invoke,
+                     _timeline_inputs(analysis_json, story, emotion, hook, duration))
+    timeline = _finish_timeline(timeline, analysis_json, duration, debug_dir, hook.hook_line, media_dir=media_dir)
+    progress("timeline", 100, f"타임라인 항목 {len(timeline.timeline)}개")
+
+    _print_timings(timings)
     return {
         "scenes": scenes,
         "story": story,
-        "timeline": timeline
+        "timeline": timeline,
+        "timings": timings
     }
+
+
+# ============================================================
+# 8️⃣ 변형(variant) 생성: scenes/story 공유, 하위 단계만 변형별 동시 실행
+# ============================================================
+async def agenerate_variants(
+    analysis_json: dict, duration: int, user_prompt: str, count: int, debug_dir: str = "results",
+    progress=None, on_timeline_item=None, media_dir: str = None
+):
+    """
+    scenes → story는 한 번만 실행하고, 변형마다 VARIANT_HINTS의 연출 방향으로
+    (emotion ∥ hook) → timeline을 실행. 모든 변형은 asyncio.gather로 동시에 진행.
+    반환: {"scenes", "story", "variants": [{"index", "hint", "emotion", "hook", "timeline", "timings"}], "timings"}
+    """
+    progress = progress or no_progress
+    chains = get_pipeline()
+    count = max(1, min(count, len(VARIANT_HINTS)))
+    timings = {}
+
+    # 1. 장면 분석 / 2. 스토리 생성 (공유)
+    progress("scenes", 0, "장면 분석 중")
+    t0 = time.perf_counter()
+    scenes = await chains["scene_chain"].ainvoke(_scene_inputs(analysis_json, user_prompt))
+    timings["scenes"] = round(time.perf_counter() - t0, 3)
+    progress("scenes", 100, f"장면 {len(scenes.scenes)}개")
+
+    progress("story", 0, "스토리 구성 중")
+    t0 = time.perf_counter()
+    story = await chains["story_chain"].ainvoke(_story_inputs(scenes, duration, user_prompt))
+    timings["story"] = round(time.perf_counter() - t0, 3)
+    progress("story", 100, story.tone)
+
+    story_json = story_to_json(story)
+    done = {"emotion_hook": 0, "timeline": 0}
+
+    async def run_variant(index: int) -> dict:
+        hint = VARIANT_HINTS[index]
+        v_timings = {}
+        t0 = time.perf_counter()
+        story_input = {"story_idea_json": story_json, "variant_hint": hint}
+        emotion, hook = await asyncio.gather(
+            chains["emotion_chain"].ainvoke(story_input),
+            chains["hook_chain"].ainvoke(story_input),
+        )
+        v_timings["emotion_hook"] = round(time.perf_counter() - t0, 3)
+        done["emotion_hook"] += 1
+        progress("emotion_hook", 100 * done["emotion_hook"] / count, f"변형 {index + 1}: {hook.hook_line}")
+
+        t0 = time.perf_counter()
+        inputs = {**_timeline_inputs(analysis_json, story, emotion, hook, duration), "variant_hint": hint}
+        timeline = await _atimeline(chains, inputs, on_timeline_item)
+        v_timings["timeline"] = round(time.perf_counter() - t0, 3)
+        timeline = _finish_timeline(
+            timeline, analysis_json, duration, debug_dir, hook.hook_line, suffix=f"_v{index + 1}", media_dir=media_dir
+        )
+        done["timeline"] += 1
+        progress("timeline", 100 * done["timeline"] / count, f"변형 {done['timeline']}/{count} 타임라인 완료")
+        return {"index": index, "hint": hint, "emotion": emotion, "hook": hook, "timeline": timeline, "timings": v_timings}
+
+    t0 = time.perf_counter()
+    variants = await asyncio.gather(*(run_variant(i) for i in range(count)))
+    timings["variants"] = round(time.perf_counter() - t0, 3)
+
+    _print_timings(timings)
+    return {"scenes": scenes, "story": story, "variants": list(variants), "timings": timings}
+
+
+def generate_variants(
+    analysis_json: dict, duration: int, user_prompt: str, count: int, debug_dir: str = "results",
+    progress=None, on_timeline_item=None, media_dir: str = None
+):
+    return run_async(agenerate_variants(
+        analysis_json, duration, user_prompt, count, debug_dir, progress, on_timeline_item, media_dir
+    ))
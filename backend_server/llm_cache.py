@@ -0,0 +1,86 @@
+import os
+from langchain_core.runnables import RunnableLambda
+from disk_cache import DiskCache, make_cache_key
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "true").lower() == "true"
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
+llm_cache = DiskCache(
+    os.path.join(CACHE_DIR, "llm_cache.sqlite"),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000")),
+    max_age_sec=float(os.getenv("LLM_CACHE_TTL_HOURS", "72")) * 3600,
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "100")) * 1024 * 1024,
+)
+
+
+# ============================================================
+# 1️⃣ 캐시 키 / 조회
+# ============================================================
+def chain_cache_key(prompt, schema, base_llm, mode: str = "structured"):
+    """
+    inputs → 캐시 키 함수 반환.
+    키: 모델 + temperature + 렌더링된 프롬프트 메시지 + 출력 스키마(JSON schema) + 응답 방식(mode)
+    mode: "structured"(with_structured_output, 엄격한 스키마) | "json_object"(스트리밍 JSON 모드)
+    → 느슨한 JSON 모드 결과가 엄격한 구조화 출력 자리에 재사용되지 않도록 키를 분리
+    """
+    model = getattr(base_llm, "model_name", None)
+    temperature = getattr(base_llm, "temperature", None)
+    schema_json = schema.model_json_schema()
+
+    def cache_key(inputs: dict) -> str:
+        messages = [(m.type, m.content) for m in prompt.format_messages(**inputs)]
+        return make_cache_key("llm", model, temperature, messages, schema_json, mode)
+
+    return cache_key
+
+
+def lookup_cached(name: str, key: str, schema):
+    """캐시 히트면 검증된 Pydantic 객체, 아니면 None"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    cached = llm_cache.get(key)
+    if cached is None:
+        return None
+    print(f"⚡ LLM 캐시 사용: {name}")
+    return schema.model_validate(cached)
+
+
+# ============================================================
+# 2️⃣ 구조화 출력 체인 앞단 캐시
+# ============================================================
+def cached_chain(name: str, prompt, structured_llm, schema, base_llm):
+    """
+    prompt | structured_llm 체인을 캐시로 감싼 Runnable 반환 (invoke / ainvoke 모두 지원).
+    값: 검증된 Pydantic 출력의 model_dump() → 히트 시 네트워크 호출과 구조화 출력 파싱을 모두 생략
+    """
+    chain = prompt | structured_llm
+    if not LLM_CACHE_ENABLED:
+        return chain
+
+    cache_key = chain_cache_key(prompt, schema, base_llm)
+
+    def lookup(key: str):
+        return lookup_cached(name, key, schema)
+
+    def invoke(inputs: dict):
+        key = cache_key(inputs)
+        hit = lookup(key)
+        if hit is not None:
+            return hit
+        out = chain.invoke(inputs)
+        llm_cache.set(key, out.model_dump())
+        return out
+
+    async def ainvoke(inputs: dict):
+        key = cache_key(inputs)
+        hit = lookup(key)
+        if hit is not None:
+            return hit
+        out = await chain.ainvoke(inputs)
+        llm_cache.set(key, out.model_dump())
+        return out
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"cached_{name}")
@@ -1,5 +1,7 @@
 import json
-from langchain_story import run_openai_pipeline, ScenesOutput, StoryIdeaOutput, TimelineOutput
+from schemas import ScenesOutput, StoryIdeaOutput, TimelineOutput
+from local_planner import run_local_planner
+from progress import no_progress
 
 # ============================================================
 # 1️⃣ 안전 실행 유틸리티
@@ -16,26 +18,44 @@ def safe_run(chain_func, *args, **kwargs):
 # ============================================================
 # 2️⃣ OpenAI 기반 파이프라인 실행
 # ============================================================
-def run_pipeline(analysis_json: dict, duration: int, user_prompt: str):
+def _local_plan(analysis_json: dict, duration: int, user_prompt: str, progress) -> dict:
+    progress = progress or no_progress
+    progress("timeline", 0, "로컬 타임라인 구성 중")
+    result = run_local_planner(analysis_json, duration, user_prompt)
+    progress("timeline", 100, f"타임라인 항목 {len(result['timeline'].timeline)}개")
+    return result
+
+
+def run_pipeline(
+    analysis_json: dict, duration: int, user_prompt: str, debug_dir: str = "results", progress=None,
+    mode: str = "llm", on_timeline_item=None, media_dir: str = None
+):
     """
     OpenAI Vision 분석 결과(JSON dict)를 LangChain 파이프라인에 전달하여
     scenes → story → timeline 결과를 생성.
+    debug_dir: timeline_debug.json 저장 위치 (작업 공간별 results 폴더)
+    progress: 단계별 진행률 콜백 (scenes / story / emotion_hook / timeline)
+    mode: "llm"(기본) | "fast"(LLM 없이 규칙 기반 로컬 플래너)
+    on_timeline_item: 타임라인 스트리밍 중 항목이 완성될 때마다 호출되는 콜백
+    media_dir: 업로드 폴더 (타임라인 보정 시 분석 결과에서 빠진 파일도 존재하면 유효로 인정)
+    LLM 실행이 실패하거나 영상/이미지가 없는 타임라인이 나오면 로컬 플래너로 대체합니다.
     """
+    if mode == "fast":
+        print("⚡ fast 모드: 로컬 타임라인 플래너 실행")
+        return _local_plan(analysis_json, duration, user_prompt, progress)
 
     print("🧠 LangChain 파이프라인 실행 중...")
 
     try:
-        result = run_openai_pipeline(analysis_json, duration, user_prompt)
+        # LangChain/OpenAI 스택은 llm 모드에서만 import (fast 모드·대체 경로는 설치/설정 없이 동작)
+        from langchain_story import run_openai_pipeline
+        result = run_openai_pipeline(
+            analysis_json, duration, user_prompt, debug_dir=debug_dir, progress=progress,
+            on_timeline_item=on_timeline_item, media_dir=media_dir
+        )
     except Exception as e:
-        print(f"⚠️ LangChain 실행 중 오류 발생: {e}")
-        return {
-            "scenes": ScenesOutput(scenes=[]),
-            "story": StoryIdeaOutput(
-                tone="", opening="", development="", closing="", key_message="",
-                opening_sec=0, development_sec=0, closing_sec=0
-            ),
-            "timeline": TimelineOutput(story_summary="", timeline=[])
-        }
+        print(f"⚠️ LangChain 실행 중 오류 발생: {e} → 로컬 플래너로 대체")
+        return _local_plan(analysis_json, duration, user_prompt, progress)
 
     # 모델이 아닌 dict를 반환할 경우, 강제 변환
     if isinstance(result, dict):
@@ -45,12 +65,60 @@ def run_pipeline(analysis_json: dict, duration: int, user_prompt: str):
             opening_sec=0, development_sec=0, closing_sec=0
         ))
         timeline = result.get("timeline", TimelineOutput(story_summary="", timeline=[]))
+        timings = result.get("timings", {})
     else:
         # LLM 결과가 객체일 경우 그대로 유지
         scenes, story, timeline = result.scenes, result.story, result.timeline
+        timings = {}
+
+    if not any(item.type in ("video", "image") for item in timeline.timeline):
+        print("⚠️ LLM 타임라인에 영상/이미지가 없음 → 로컬 플래너로 대체")
+        fallback = _local_plan(analysis_json, duration, user_prompt, progress)
+        return {"scenes": scenes, "story": story, "timeline": fallback["timeline"], "timings": timings}
 
     print("✅ LangChain 파이프라인 완료!")
-    return {"scenes": scenes, "story": story, "timeline": timeline}
+    return {"scenes": scenes, "story": story, "timeline": timeline, "timings": timings}
+
+
+# ============================================================
+# 4️⃣ 변형(variant) 여러 개 생성
+# ============================================================
+def run_variants(
+    analysis_json: dict, duration: int, user_prompt: str, count: int, debug_dir: str = "results",
+    progress=None, mode: str = "llm", on_timeline_item=None, media_dir: str = None
+) -> dict:
+    """
+    같은 분석 결과로 타임라인 변형 count개 생성 (scenes/story는 공유).
+    fast 모드이거나 LLM 실행이 실패하면 로컬 플래너로 미디어 순서를 바꿔 가며 생성하고,
+    영상/이미지가 없는 LLM 변형은 그 변형만 로컬 플래너 결과로 대체합니다.
+    반환: {"scenes", "story", "variants": [{"index", "timeline", "hook_line", ...}], "timings"}
+    """
+    if mode != "fast":
+        print(f"🧠 LangChain 변형 {count}개 생성 중...")
+        try:
+            from langchain_story import generate_variants
+            result = generate_variants(
+                analysis_json, duration, user_prompt, count, debug_dir=debug_dir, progress=progress,
+                on_timeline_item=on_timeline_item, media_dir=media_dir
+            )
+            for v in result["variants"]:
+                v["hook_line"] = v["hook"].hook_line
+                if not any(item.type in ("video", "image") for item in v["timeline"].timeline):
+                    print(f"⚠️ 변형 {v['index']} 타임라인에 영상/이미지가 없음 → 로컬 플래너로 대체")
+                    planned = run_local_planner(analysis_json, duration, user_prompt, offset=v["index"])
+                    v["timeline"] = planned["timeline"]
+            return result
+        except Exception as e:
+            print(f"⚠️ 변형 생성 중 오류 발생: {e} → 로컬 플래너로 대체")
+
+    progress = progress or no_progress
+    progress("timeline", 0, "로컬 타임라인 변형 구성 중")
+    variants = []
+    for index in range(count):
+        planned = run_local_planner(analysis_json, duration, user_prompt, offset=index)
+        variants.append({"index": index, "hint": "", "hook_line": "", "timeline": planned["timeline"], "timings": {}})
+    progress("timeline", 100, f"타임라인 변형 {count}개")
+    return {"scenes": planned["scenes"], "story": planned["story"], "variants": variants, "timings": {}}
 
 
 # ============================================================
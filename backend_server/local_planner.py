@@ -0,0 +1,122 @@
+import re, math
+from schemas import SceneItem, ScenesOutput, StoryIdeaOutput, TimelineItem, TimelineOutput, split_duration
+
+# ============================================================
+# 0️⃣ 설정
+# ============================================================
+MIN_CUT_SEC = 3.0
+MAX_CUT_SEC = 7.0
+TARGET_CUT_SEC = 5.0
+SUBTITLE_MAX_CHARS = 25
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+# ============================================================
+# 1️⃣ Helper Functions
+# ============================================================
+def subtitle_from_description(description: str, max_chars: int = SUBTITLE_MAX_CHARS) -> str:
+    """description 첫 문장을 자막 1줄(max_chars 이내)로 요약"""
+    text = (description or "").strip()
+    if not text:
+        return ""
+    first = _SENTENCE_RE.split(text)[0].strip().rstrip(".")
+    if len(first) <= max_chars:
+        return first
+    cut = first[:max_chars]
+    if " " in cut:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip(",·") + "…"
+
+
+def cut_lengths(span: float) -> list:
+    """구간 길이를 3~7초 사이의 같은 길이 컷들로 분할 (구간이 3초보다 짧으면 컷 1개)"""
+    if span <= 0:
+        return []
+    if span < MIN_CUT_SEC:
+        return [span]
+    n_min = math.ceil(span / MAX_CUT_SEC)
+    n_max = max(n_min, math.floor(span / MIN_CUT_SEC))
+    n = min(max(round(span / TARGET_CUT_SEC), n_min), n_max)
+    return [span / n] * n
+
+
+def _interleave(videos: list, images: list) -> list:
+    """영상/이미지를 번갈아 배치 (영상 우선 → 첫 컷 후킹 장면은 영상)"""
+    seq = []
+    for i in range(max(len(videos), len(images))):
+        if i < len(videos):
+            seq.append(("video", videos[i]))
+        if i < len(images):
+            seq.append(("image", images[i]))
+    return seq
+
+
+# ============================================================
+# 2️⃣ 규칙 기반 타임라인 생성 (LLM 호출 없음)
+# ============================================================
+def plan_timeline(
+    analysis_json: dict, duration: int, hook_line: str = None, story_summary: str = "", offset: int = 0
+) -> TimelineOutput:
+    """
+    normalize된 분석 결과 + split_duration()으로 타임라인 구성:
+    - opening / development / closing 구간을 3~7초 컷으로 나누고 영상/이미지를 순환 배치
+    - 각 컷마다 description 기반 subtitle 추가 (첫 컷은 hook_line 우선)
+    - 오디오는 첫 번째 파일을 전체 길이에 배치
+    offset: 미디어 순환 시작 위치 (변형마다 다른 컷 순서를 만들 때 사용)
+    """
+    split = split_duration(duration)
+    media = _interleave(analysis_json.get("videos", []), analysis_json.get("images", []))
+    timeline = []
+
+    t = 0.0
+    cut_index = 0
+    used = {}   # 영상별 이미 사용한 길이 → 재사용 시 다음 구간부터 (렌더러가 원본 길이 안으로 보정)
+    for key in ("opening_sec", "development_sec", "closing_sec"):
+        for length in cut_lengths(float(split[key])):
+            start, end = round(t, 3), round(t + length, 3)
+            t += length
+            if not media:
+                continue
+            kind, item = media[(cut_index + offset) % len(media)]
+            caption = subtitle_from_description(item.get("description"))
+            source_start = None
+            if kind == "video":
+                source_start = round(used.get(item["filename"], 0.0), 3) or None
+                used[item["filename"]] = used.get(item["filename"], 0.0) + length
+            timeline.append(TimelineItem(
+                type=kind, filename=item["filename"], text=caption, start=start, end=end, source_start=source_start
+            ))
+            text = hook_line if (cut_index == 0 and hook_line) else caption
+            if text:
+                timeline.append(TimelineItem(type="subtitle", text=text, start=start, end=end))
+            cut_index += 1
+
+    audio = analysis_json.get("audio", [])
+    if audio:
+        timeline.append(TimelineItem(type="audio", filename=audio[0]["filename"], start=0.0, end=float(duration)))
+
+    return TimelineOutput(story_summary=story_summary, timeline=timeline)
+
+
+def run_local_planner(analysis_json: dict, duration: int, user_prompt: str, offset: int = 0) -> dict:
+    """run_pipeline과 같은 형태의 결과(scenes/story/timeline)를 LLM 없이 생성"""
+    split = split_duration(duration)
+    timeline = plan_timeline(analysis_json, duration, story_summary=user_prompt, offset=offset)
+
+    visuals = [i for i in timeline.timeline if i.type in ("video", "image")]
+    scenes = ScenesOutput(scenes=[
+        SceneItem(scene_id=n, summary=item.text or "", highlight=item.filename or "")
+        for n, item in enumerate(visuals, start=1)
+    ])
+    third = max(1, math.ceil(len(visuals) / 3))
+    story = StoryIdeaOutput(
+        tone="정보전달형",
+        opening=" / ".join(i.text or "" for i in visuals[:third]),
+        development=" / ".join(i.text or "" for i in visuals[third:third * 2]),
+        closing=" / ".join(i.text or "" for i in visuals[third * 2:]),
+        key_message=user_prompt,
+        **split
+    )
+    print(f"⚡ 로컬 타임라인 플래너: 컷 {len(visuals)}개, 항목 {len(timeline.timeline)}개")
+    return {"scenes": scenes, "story": story, "timeline": timeline, "timings": {}}
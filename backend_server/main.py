@@ -1,11 +1,17 @@
 import os
-import cv2
 import json
-import base64
 from openai import OpenAI
-from local_langchain import run_pipeline
-from movie import render_shorts_from_timeline
+from local_langchain import run_pipeline, run_variants
+from movie import render_shorts_from_timeline, render_variants, MediaPrefetcher, RENDER_BACKEND, draft_resolution
 from dotenv import load_dotenv
+from disk_cache import DiskCache, make_cache_key
+from file_utils import file_sha256, check_file_type, remember_file_hash
+from analysis_engine import call_with_retry, map_concurrent, ANALYSIS_CONCURRENCY
+from image_prep import prepare_image_file, prepare_frame, load_image_for_vision, estimate_image_tokens, VISION_PREP_SETTINGS
+from video_frames import extract_keyframes, KEYFRAME_SCENE_DETECT, KEYFRAME_CANDIDATES
+from progress import no_progress
+from media_retrieval import select_relevant_media
+from proxy_media import ProxyBuilder
 
 # ==============================
 # 0. 설정
@@ -17,7 +23,57 @@ os.makedirs(RESULT_DIR, exist_ok=True)
 # 환경변수나 직접 API Key 지정
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# 재시도는 analysis_engine.call_with_retry에서 처리 (SDK 자체 재시도는 끔)
+# OPENAI_BASE_URL을 지정하면 로컬 스텁 서버로 요청을 보낼 수 있음
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL") or None,
+    max_retries=0,
+)
+
+VISION_MODEL = "gpt-4o-mini"
+
+IMAGE_PROMPT = (
+    "이 이미지를 자세히 분석해줘. "
+    "무엇이 보이는지, 사람/사물/텍스트가 있으면 구체적으로 설명하고, "
+    "이미지의 전체적인 분위기나 상황을 요약해줘."
+)
+
+VIDEO_PROMPT = (
+    "이 영상의 장면 변화와 동작을 설명해줘. "
+    "프레임 간의 움직임, 등장하는 인물/사물, 전환된 장면들 요약해줘."
+)
+
+# 이미지 여러 장을 한 번의 요청으로 분석 (요청 1건당 이미지 수/용량/토큰 한도)
+VISION_BATCH_IMAGES = os.getenv("VISION_BATCH_IMAGES", "true").lower() == "true"
+VISION_BATCH_MAX_IMAGES = int(os.getenv("VISION_BATCH_MAX_IMAGES", "8"))
+VISION_BATCH_MAX_MB = float(os.getenv("VISION_BATCH_MAX_MB", "8"))
+VISION_BATCH_MAX_TOKENS = int(os.getenv("VISION_BATCH_MAX_TOKENS", "12000"))
+
+BATCH_PROMPT = (
+    "아래에 [이미지 번호] 파일명 라벨이 붙은 이미지 {count}장이 있습니다. 각 이미지를 따로 분석해줘. "
+    "각 이미지마다: " + IMAGE_PROMPT + "\n"
+    "반드시 아래 JSON 형식으로만 답하고, 모든 이미지에 대해 index와 filename을 라벨 그대로 적어줘.\n"
+    '{{"results": [{{"index": 1, "filename": "파일명", "description": "분석 내용"}}]}}'
+)
+
+# 분석 결과 캐시 (파일 내용 해시 + 프롬프트 + 모델 기준)
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+analysis_cache = DiskCache(
+    os.path.join(CACHE_DIR, "analysis_cache.sqlite"),
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "5000")),
+    max_age_sec=float(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "30")) * 86400,
+    max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_MB", "200")) * 1024 * 1024,
+)
+
+
+def analysis_cache_key(kind: str, path: str, prompt: str, **params) -> str:
+    """파일 내용 해시 + 분석 종류 + 프롬프트 + 모델 + 이미지 전처리 설정(+추가 파라미터)으로 캐시 키 생성"""
+    return make_cache_key(kind, file_sha256(path), prompt, VISION_MODEL, VISION_PREP_SETTINGS, params)
+
+
+def is_image_file(path: str) -> bool:
+    return check_file_type(path) == "image"
 
 
 # ==============================
@@ -26,18 +82,20 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 def analyze_image_openai(image_path: str) -> dict:
     print(f"🖼️ 이미지 분석 중: {image_path}")
 
-    with open(image_path, "rb") as f:
-        img_b64 = base64.b64encode(f.read()).decode("utf-8")
+    cache_key = analysis_cache_key("image", image_path, IMAGE_PROMPT)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        print(f"⚡ 캐시 사용: {os.path.basename(image_path)}")
+        return {"type": "image", "filename": os.path.basename(image_path), "description": cached}
 
-    prompt = (
-        "이 이미지를 자세히 분석해줘. "
-        "무엇이 보이는지, 사람/사물/텍스트가 있으면 구체적으로 설명하고, "
-        "이미지의 전체적인 분위기나 상황을 요약해줘."
-    )
+    prompt = IMAGE_PROMPT
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        # 원본 대신 Vision 해상도로 축소·재인코딩한 data URL 전송 (MIME 자동 지정, 손상된 파일은 아래에서 오류 처리)
+        image_url = prepare_image_file(image_path)
+        response = call_with_retry(
+            client.chat.completions.create,
+            model=VISION_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -46,7 +104,7 @@ def analyze_image_openai(image_path: str) -> dict:
                         {
                             "type": "image_url",  # ✅ 수정: input_image → image_url
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{img_b64}"
+                                    "url": image_url
                                     }
                         },
                     ],
@@ -56,6 +114,8 @@ def analyze_image_openai(image_path: str) -> dict:
         )
 
         description = response.choices[0].message.content
+        if description:
+            analysis_cache.set(cache_key, description)
         print(f"✅ 분석 완료: {os.path.basename(image_path)}")
         return {"type": "image", "filename": os.path.basename(image_path), "description": description}
     except Exception as e:
@@ -66,77 +126,232 @@ def analyze_image_openai(image_path: str) -> dict:
 # ==============================
 # 2. OpenAI Vision 기반 영상 분석
 # ==============================
-def analyze_video_openai(video_path: str, num_frames: int = 5) -> dict:
+def analyze_video_openai(video_path: str, num_frames: int = 5, scene_detect: bool = KEYFRAME_SCENE_DETECT) -> dict:
     print(f"🎥 영상 분석 중: {video_path}")
 
-    cap = cv2.VideoCapture(video_path)
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    frames = []
-
-    for i in range(num_frames):
-        idx = int(total * (i + 1) / (num_frames + 1))
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        _, buf = cv2.imencode(".jpg", frame)
-        b64 = base64.b64encode(buf).decode("utf-8")
-        frames.append(b64)
-    cap.release()
-
-    prompt = (
-        "이 영상의 장면 변화와 동작을 설명해줘. "
-        "프레임 간의 움직임, 등장하는 인물/사물, 전환된 장면들 요약해줘."
+    cache_key = analysis_cache_key(
+        "video", video_path, VIDEO_PROMPT,
+        num_frames=num_frames, scene_detect=scene_detect, candidates=KEYFRAME_CANDIDATES,
     )
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        print(f"⚡ 캐시 사용: {os.path.basename(video_path)}")
+        return {"type": "video", "filename": os.path.basename(video_path), "description": cached}
+
+    # 한 번의 순차 디코딩으로 키프레임 추출 (프레임별 seek 없음)
+    keyframes, stats = extract_keyframes(video_path, num_frames, scene_detect=scene_detect)
+    frames = [prepare_frame(frame) for frame in keyframes]
+    print(
+        f"⏱️ 키프레임 추출: {os.path.basename(video_path)} → {stats['frames']}장 "
+        f"({stats['mode']}, {stats['decoded_frames']}프레임 디코딩, {stats['extract_sec']}s)"
+    )
+
+    prompt = VIDEO_PROMPT
 
     try:
         content = [{"type": "text", "text": prompt}]
-        for b64 in frames:
+        for frame_url in frames:
             content.append({
                 "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
+                "image_url": {"url": frame_url}
             })
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = call_with_retry(
+            client.chat.completions.create,
+            model=VISION_MODEL,
             messages=[{"role": "user", "content": content}],
             temperature=0.2,
         )
         description = response.choices[0].message.content
+        if description:
+            analysis_cache.set(cache_key, description)
         print(f"✅ 영상 분석 완료: {os.path.basename(video_path)}")
-        return {"type": "video", "filename": os.path.basename(video_path), "description": description}
+        return {
+            "type": "video",
+            "filename": os.path.basename(video_path),
+            "description": description,
+            "extract_sec": stats["extract_sec"],
+        }
     except Exception as e:
         print(f"⚠️ 영상 분석 오류: {e}")
         return {"type": "video", "filename": os.path.basename(video_path), "description": None}
 
 
 
+# ==============================
+# 2.5 이미지 배치 분석 (여러 장 → 요청 1건)
+# ==============================
+def _load_for_batch(path: str):
+    """배치용 인코딩, 읽을 수 없는 이미지는 None (단건 분석에서 오류 레코드로 처리)"""
+    try:
+        return load_image_for_vision(path)
+    except Exception as e:
+        print(f"⚠️ 이미지 인코딩 실패: {os.path.basename(path)} ({e})")
+        return None
+
+
+def plan_image_batches(image_paths: list, max_workers: int = ANALYSIS_CONCURRENCY) -> tuple:
+    """
+    이미지를 Vision 해상도로 인코딩한 뒤, 이미지 수/요청 용량/토큰 한도 안에서
+    순서대로 묶어 ([[(path, data_url), ...], ...] 배치 목록, 인코딩 실패 경로 목록)을 만듦
+    """
+    encoded = map_concurrent(_load_for_batch, image_paths, max_workers=max_workers)
+    max_bytes = VISION_BATCH_MAX_MB * 1024 * 1024
+
+    batches, failed, current, cur_bytes, cur_tokens = [], [], [], 0, 0
+    for path, loaded in zip(image_paths, encoded):
+        if loaded is None:
+            failed.append(path)
+            continue
+        url, size = loaded
+        tokens = estimate_image_tokens(*size)
+        if current and (
+            len(current) >= VISION_BATCH_MAX_IMAGES
+            or cur_bytes + len(url) > max_bytes
+            or cur_tokens + tokens > VISION_BATCH_MAX_TOKENS
+        ):
+            batches.append(current)
+            current, cur_bytes, cur_tokens = [], 0, 0
+        current.append((path, url))
+        cur_bytes += len(url)
+        cur_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches, failed
+
+
+def _parse_batch_descriptions(raw: str, names: list) -> dict:
+    """배치 응답 JSON → {이미지 순번(0부터): description}"""
+    descriptions = {}
+    for entry in json.loads(raw).get("results", []):
+        if not isinstance(entry, dict) or not entry.get("description"):
+            continue
+        idx = entry.get("index")
+        if isinstance(idx, int) and 1 <= idx <= len(names):
+            descriptions[idx - 1] = entry["description"]
+        elif entry.get("filename") in names:
+            descriptions[names.index(entry["filename"])] = entry["description"]
+    return descriptions
+
+
+def analyze_image_batch_openai(batch: list) -> list:
+    """[(path, data_url), ...] 배치를 한 번에 분석 후 파일별 레코드로 분리"""
+    names = [os.path.basename(path) for path, _ in batch]
+    print(f"🖼️ 이미지 배치 분석 중 ({len(batch)}장): {names}")
+
+    content = [{"type": "text", "text": BATCH_PROMPT.format(count=len(batch))}]
+    for i, (name, (_, url)) in enumerate(zip(names, batch), start=1):
+        content.append({"type": "text", "text": f"[이미지 {i}] {name}"})
+        content.append({"type": "image_url", "image_url": {"url": url}})
+
+    descriptions = {}
+    try:
+        response = call_with_retry(
+            client.chat.completions.create,
+            model=VISION_MODEL,
+            messages=[{"role": "user", "content": content}],
+            temperature=0.2,
+            response_format={"type": "json_object"},
+        )
+        descriptions = _parse_batch_descriptions(response.choices[0].message.content, names)
+        print(f"✅ 배치 분석 완료: {len(descriptions)}/{len(batch)}장")
+    except Exception as e:
+        print(f"⚠️ 이미지 배치 분석 오류: {e}")
+
+    results = []
+    for i, (path, _) in enumerate(batch):
+        if i in descriptions:
+            analysis_cache.set(analysis_cache_key("image", path, IMAGE_PROMPT), descriptions[i])
+            results.append({"type": "image", "filename": names[i], "description": descriptions[i]})
+        else:
+            # 응답에서 빠진 이미지는 단건 분석으로 보완
+            results.append(analyze_image_openai(path))
+    return results
+
+
 # ==============================
 # 3. 모든 미디어 파일 통합 분석
 # ==============================
-def analyze_all_media() -> list:
-    print("📂 media 폴더에서 파일을 불러옵니다...")
+def analyze_media_file(path: str) -> dict:
+    if is_image_file(path):
+        return analyze_image_openai(path)
+    return analyze_video_openai(path)
+
+
+def _cached_image_record(path: str):
+    description = analysis_cache.get(analysis_cache_key("image", path, IMAGE_PROMPT))
+    if description is None:
+        return None
+    return {"type": "image", "filename": os.path.basename(path), "description": description}
+
+
+def _analyze_task(task: tuple) -> list:
+    kind, payload = task
+    if kind == "batch":
+        return analyze_image_batch_openai(payload)
+    return [analyze_media_file(payload)]
+
+
+def analyze_files_batched(files: list, max_workers: int = ANALYSIS_CONCURRENCY, on_done=None) -> list:
+    """캐시에 없는 이미지는 배치로, 영상은 파일 단위로 동시 분석 (결과는 files 순서)"""
+    records = {}
+    pending_images = []
+    for path in files:
+        if is_image_file(path):
+            cached = _cached_image_record(path)
+            if cached is not None:
+                records[path] = cached
+            else:
+                pending_images.append(path)
+
+    batches, failed = plan_image_batches(pending_images, max_workers=max_workers)
+    tasks = [("batch", batch) for batch in batches]
+    tasks += [("file", path) for path in failed]
+    tasks += [("file", path) for path in files if not is_image_file(path)]
+    print(f"📨 Vision 요청 {len(tasks)}건 (이미지 {len(pending_images)}장 → 배치 {len(batches)}건, 캐시 {len(records)}건)")
+
+    outputs_list = map_concurrent(_analyze_task, tasks, max_workers=max_workers, on_done=on_done)
+    for task, outputs in zip(tasks, outputs_list):
+        paths = [path for path, _ in task[1]] if task[0] == "batch" else [task[1]]
+        records.update(zip(paths, outputs))
+    return [records[path] for path in files]
+
+
+def analyze_all_media(
+    media_dir: str = MEDIA_DIR,
+    result_dir: str = RESULT_DIR,
+    max_workers: int = ANALYSIS_CONCURRENCY,
+    batch_images: bool = VISION_BATCH_IMAGES,
+    progress=None,
+) -> list:
+    """media_dir의 파일만 분석 (작업 공간을 넘기면 해당 업로드 파일만 대상)"""
+    progress = progress or no_progress
+    print(f"📂 {media_dir} 폴더에서 파일을 불러옵니다...")
     files = [
-        os.path.join(MEDIA_DIR, f)
-        for f in os.listdir(MEDIA_DIR)
-        if f.lower().endswith((".jpg", ".jpeg", ".png", ".mp4"))
+        os.path.join(media_dir, f)
+        for f in sorted(os.listdir(media_dir))
+        if check_file_type(f) != "unknown"
     ]
 
-    print(f"📦 총 {len(files)}개의 파일 감지됨")
-    all_results = []
+    print(f"📦 총 {len(files)}개의 파일 감지됨 (동시 분석 {max_workers}개)")
+    progress("vision", 0, f"{len(files)}개 파일 분석 시작")
 
-    for path in files:
-        if path.lower().endswith((".jpg", ".jpeg", ".png")):
-            result = analyze_image_openai(path)
-        else:
-            result = analyze_video_openai(path)
-        all_results.append(result)
+    def on_done(done, total):
+        progress("vision", 100 * done / total, f"Vision 요청 {done}/{total}건 완료")
+
+    if batch_images:
+        all_results = analyze_files_batched(files, max_workers=max_workers, on_done=on_done)
+    else:
+        all_results = map_concurrent(analyze_media_file, files, max_workers=max_workers, on_done=on_done)
+    progress("vision", 100, f"{len(all_results)}개 파일 분석 완료")
 
-    output_path = os.path.join(RESULT_DIR, "analysis_result.json")
+    os.makedirs(result_dir, exist_ok=True)
+    output_path = os.path.join(result_dir, "analysis_result.json")
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(all_results, f, ensure_ascii=False, indent=2)
 
     print(f"✅ 모든 미디어 분석 완료 → {output_path}")
+    print(f"📊 분석 캐시: {analysis_cache.stats()}")
     return all_results
 
 def normalize_openai_analysis(openai_results: list, user_prompt: str) -> dict:
@@ -172,6 +387,168 @@ def normalize_openai_analysis(openai_results: list, user_prompt: str) -> dict:
 # ==============================
 # 4. LangChain + MoviePy 통합 파이프라인
 # ==============================
+def run_job_pipeline(
+    ws, duration: int, user_prompt: str, files: list = None, file_hashes: dict = None, progress=None,
+    mode: str = "llm", variants: int = 1, backend: str = None, draft: bool = False, approved: bool = False
+) -> dict:
+    """
+    작업 공간 1개에 대해 분석 → LangChain → 렌더링 실행 (job_queue 워커에서 호출)
+    progress(stage, percent, message): 단계별 진행률 콜백 (progress.ProgressReporter)
+    mode: "llm" | "fast" (LLM 없이 로컬 플래너로 타임라인 생성)
+    variants: 2 이상이면 분석/scenes/story를 공유하는 변형 영상 여러 개를 생성
+    backend: 렌더링 백엔드 "moviepy" | "ffmpeg" (None이면 RENDER_BACKEND)
+    draft: True면 저해상도 초안 + 컷 썸네일만 만들고 타임라인을 저장 (본 렌더링은 approved로 다시 실행)
+    approved: 초안에서 저장한 타임라인으로 본 렌더링만 실행 (분석/LLM 생략)
+    """
+    backend = backend or RENDER_BACKEND
+    progress = progress or no_progress
+    if approved:
+        return _render_approved(ws, files, progress, backend)
+    # 업로드 중 계산된 해시 재사용 (분석 캐시 키 계산 시 파일을 다시 읽지 않음)
+    for filename, digest in (file_hashes or {}).items():
+        path = os.path.join(ws.media_dir, filename)
+        if os.path.exists(path):
+            remember_file_hash(path, digest)
+    # 렌더링 해상도 프록시는 분석/LLM 단계와 동시에 백그라운드에서 생성 (실패해도 프록시 풀은 항상 정리)
+    proxies = ProxyBuilder(ws.media_dir).start(files)
+    try:
+        return _run_pipeline_job(ws, duration, user_prompt, files, progress, mode, variants, backend, draft, proxies)
+    finally:
+        proxies.close()
+
+
+def _run_pipeline_job(
+    ws, duration: int, user_prompt: str, files, progress, mode: str, variants: int, backend: str, draft: bool,
+    proxies: ProxyBuilder
+) -> dict:
+    """분석 → LangChain → 렌더링 (단일 영상 또는 변형 여러 개)"""
+    print("🧠 Step 1. OpenAI Vision 분석 중...")
+    analysis_results = analyze_all_media(media_dir=ws.media_dir, result_dir=ws.result_dir, progress=progress)
+    print(f"✅ 분석 완료: {len(analysis_results)}개 항목")
+
+    print("🧩 Step 2. LangChain 파이프라인 실행...")
+    normalized = normalize_openai_analysis(analysis_results, user_prompt)
+    normalized = select_relevant_media(normalized, user_prompt)
+    if variants > 1:
+        return _run_variant_job(
+            ws, normalized, duration, user_prompt, files, progress, mode, variants, backend, proxies
+        )
+
+    # 타임라인이 스트리밍되는 동안 등장한 미디어를 미리 열어 렌더링 준비 시간을 겹침
+    resolution = draft_resolution() if draft else (1080, 1920)
+    prefetcher = MediaPrefetcher(
+        media_dir=ws.media_dir, resolution=resolution, enabled=backend == "moviepy", proxies=proxies
+    )
+    try:
+        result = run_pipeline(
+            normalized, duration=duration, user_prompt=user_prompt, debug_dir=ws.result_dir, progress=progress,
+            mode=mode, on_timeline_item=prefetcher.submit, media_dir=ws.media_dir
+        )
+
+        # 렌더러가 TimelineOutput을 그대로 받으므로 dict 변환 없이 전달
+        proxies.wait()
+        if draft:
+            with open(ws.render_timeline_path, "w", encoding="utf-8") as f:
+                f.write(result["timeline"].model_dump_json(indent=2))
+        render_shorts_from_timeline(
+            result["timeline"], output_path=ws.draft_output_path if draft else ws.output_path, media_dir=ws.media_dir,
+            progress=progress, prefetcher=prefetcher, backend=backend, draft=draft,
+            contact_sheet_path=ws.contact_sheet_path if draft else None
+        )
+    finally:
+        prefetcher.close()
+    if not os.path.exists(ws.draft_output_path if draft else ws.output_path):
+        raise RuntimeError("렌더링 결과 영상이 생성되지 않았습니다. (타임라인에 렌더링 가능한 항목 없음)")
+
+    if draft:
+        return {
+            "message": "📝 초안 생성 완료! 확인 후 본 렌더링을 요청하세요.",
+            "job_id": ws.job_id,
+            "draft": True,
+            "draft_path": ws.draft_output_url,
+            "contact_sheet_path": ws.contact_sheet_url if os.path.exists(ws.contact_sheet_path) else None,
+            "render_url": f"/api/jobs/{ws.job_id}/render",
+            "files": files or [],
+            "llm_timings": result.get("timings", {}),
+        }
+
+    return {
+        "message": "✅ 영상 생성 완료!",
+        "job_id": ws.job_id,
+        "result_path": ws.output_url,
+        "files": files or [],
+        "llm_timings": result.get("timings", {}),
+    }
+
+
+def _render_approved(ws, files, progress, backend: str) -> dict:
+    """초안 단계에서 저장한 타임라인을 최종 해상도로 렌더링 (분석/LLM 결과 재사용)"""
+    # 저장된 JSON 문자열을 그대로 넘겨 pydantic-core로 한 번에 검증 (json.loads → dict 검증 생략)
+    with open(ws.render_timeline_path, "r", encoding="utf-8") as f:
+        timeline = f.read()
+
+    ProxyBuilder(ws.media_dir).start(files).wait()
+    print("🎬 초안 승인 → 본 렌더링 시작")
+    render_shorts_from_timeline(
+        timeline, output_path=ws.output_path, media_dir=ws.media_dir, progress=progress, backend=backend
+    )
+    if not os.path.exists(ws.output_path):
+        raise RuntimeError("렌더링 결과 영상이 생성되지 않았습니다. (타임라인에 렌더링 가능한 항목 없음)")
+
+    return {
+        "message": "✅ 영상 생성 완료!",
+        "job_id": ws.job_id,
+        "result_path": ws.output_url,
+        "draft_path": ws.draft_output_url,
+        "contact_sheet_path": ws.contact_sheet_url if os.path.exists(ws.contact_sheet_path) else None,
+        "files": files or [],
+        "llm_timings": {},
+    }
+
+
+def _run_variant_job(
+    ws, normalized: dict, duration: int, user_prompt: str, files, progress, mode: str, count: int, backend: str,
+    proxies: ProxyBuilder
+) -> dict:
+    """변형 count개 생성 → 디코딩된 소스를 공유하며 일괄 렌더링"""
+    prefetcher = MediaPrefetcher(media_dir=ws.media_dir, enabled=backend == "moviepy", proxies=proxies)
+    try:
+        result = run_variants(
+            normalized, duration=duration, user_prompt=user_prompt, count=count, debug_dir=ws.result_dir,
+            progress=progress, mode=mode, on_timeline_item=prefetcher.submit, media_dir=ws.media_dir
+        )
+        variants = result["variants"]
+        proxies.wait()
+        render_variants(
+            [v["timeline"] for v in variants],
+            [ws.variant_output_path(v["index"]) for v in variants],
+            media_dir=ws.media_dir, progress=progress, prefetcher=prefetcher, backend=backend
+        )
+    finally:
+        prefetcher.close()
+
+    rendered = [v for v in variants if os.path.exists(ws.variant_output_path(v["index"]))]
+    if not rendered:
+        raise RuntimeError("렌더링 결과 영상이 생성되지 않았습니다. (타임라인에 렌더링 가능한 항목 없음)")
+
+    return {
+        "message": f"✅ 영상 {len(rendered)}개 생성 완료!",
+        "job_id": ws.job_id,
+        "result_path": ws.variant_output_url(rendered[0]["index"]),
+        "variants": [
+            {
+                "index": v["index"],
+                "result_path": ws.variant_output_url(v["index"]),
+                "hook_line": v.get("hook_line", ""),
+                "llm_timings": v.get("timings", {}),
+            }
+            for v in rendered
+        ],
+        "files": files or [],
+        "llm_timings": result.get("timings", {}),
+    }
+
+
 def main():
     print("🚀 OpenAI Vision 기반 통합 파이프라인 실행 시작!")
     combined_analysis = analyze_all_media()
@@ -187,30 +564,12 @@ def main():
     
     
     combined_analysis = normalize_openai_analysis(combined_analysis, prompt)
-    result = run_pipeline(combined_analysis, duration=30, user_prompt = prompt)
-
-    # Pydantic-safe JSON 변환
-    def make_json_serializable(obj):
-        result = run_pipeline(combined_analysis, duration=30, user_prompt=prompt)
-
-# ✅ LangChain Pydantic 결과를 JSON/dict로 변환
-    if hasattr(result, "model_dump"):
-        result = result.model_dump()
-    elif isinstance(result, dict):
-        # 내부 Pydantic 객체까지 안전 변환
-        def recursive_dump(obj):
-            if hasattr(obj, "model_dump"):
-                return obj.model_dump()
-            elif isinstance(obj, dict):
-                return {k: recursive_dump(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [recursive_dump(v) for v in obj]
-            else:
-                return obj
-        result = recursive_dump(result)
+    combined_analysis = select_relevant_media(combined_analysis, prompt)
+    result = run_pipeline(combined_analysis, duration=30, user_prompt = prompt, media_dir=MEDIA_DIR)
 
+    # TimelineOutput을 그대로 렌더러에 전달 (model_dump 변환 불필요)
     print("\n🎬 MoviePy 영상 렌더링 중...")
-    render_shorts_from_timeline(result, output_path=os.path.join(RESULT_DIR, "final_shorts.mp4"))
+    render_shorts_from_timeline(result["timeline"], output_path=os.path.join(RESULT_DIR, "final_shorts.mp4"))
 
     
     
@@ -0,0 +1,111 @@
+import os, re, hashlib
+from collections import Counter, OrderedDict
+import numpy as np
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_K_VIDEOS = int(os.getenv("RETRIEVAL_TOP_K_VIDEOS", "8"))
+RETRIEVAL_TOP_K_IMAGES = int(os.getenv("RETRIEVAL_TOP_K_IMAGES", "12"))
+
+# BM25 파라미터
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"\w+")
+_TERM_CACHE_SIZE = 4096
+_term_cache = OrderedDict()  # description sha1 → Counter
+
+
+# ============================================================
+# 1️⃣ 토큰화 (단어 + 한글 2-gram, description별 캐시)
+# ============================================================
+def tokenize(text: str) -> list:
+    """
+    공백 단위 단어와 단어 내부 글자 2-gram을 함께 사용.
+    조사가 붙은 한국어("학생들이" / "학생")도 부분 일치하도록 하기 위함
+    """
+    terms = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        terms.append(word)
+        if len(word) > 2:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def _doc_terms(text: str) -> Counter:
+    """description별 단어 빈도 (분석 결과가 파일 해시 기준으로 캐시되므로 같은 파일은 같은 키)"""
+    key = hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+    if key in _term_cache:
+        _term_cache.move_to_end(key)
+        return _term_cache[key]
+    terms = Counter(tokenize(text))
+    _term_cache[key] = terms
+    if len(_term_cache) > _TERM_CACHE_SIZE:
+        _term_cache.popitem(last=False)
+    return terms
+
+
+# ============================================================
+# 2️⃣ BM25 점수 (행렬 연산)
+# ============================================================
+def bm25_scores(query: str, docs: list) -> np.ndarray:
+    """query와 각 문서(description)의 BM25 점수"""
+    q_terms = sorted(set(tokenize(query)))
+    if not docs or not q_terms:
+        return np.zeros(len(docs))
+
+    doc_terms = [_doc_terms(d) for d in docs]
+    # (문서 수 × 질의 단어 수) 빈도 행렬
+    tf = np.array([[terms.get(t, 0) for t in q_terms] for terms in doc_terms], dtype=np.float64)
+    doc_len = np.array([sum(terms.values()) for terms in doc_terms], dtype=np.float64)
+    avg_len = doc_len.mean() or 1.0
+
+    n = len(docs)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len)
+    weighted = tf * (BM25_K1 + 1) / (tf + norm[:, None])
+    return weighted @ idf
+
+
+def _top_k(items: list, query: str, k: int) -> list:
+    """점수 상위 k개를 원래 순서대로 반환 (k 이하이면 그대로)"""
+    if k <= 0 or len(items) <= k:
+        return items
+    scores = bm25_scores(query, [item.get("description") or "" for item in items])
+    keep = set(np.argsort(-scores, kind="stable")[:k].tolist())
+    return [item for i, item in enumerate(items) if i in keep]
+
+
+# ============================================================
+# 3️⃣ 프롬프트 관련 미디어만 선택
+# ============================================================
+def select_relevant_media(
+    analysis_json: dict,
+    user_prompt: str,
+    top_k_videos: int = RETRIEVAL_TOP_K_VIDEOS,
+    top_k_images: int = RETRIEVAL_TOP_K_IMAGES,
+) -> dict:
+    """
+    normalize_openai_analysis 결과에서 user_prompt와 관련도가 높은
+    영상/이미지 상위 k개만 남긴 사본을 반환 (오디오는 모두 유지)
+    """
+    if not RETRIEVAL_ENABLED:
+        return analysis_json
+
+    videos = analysis_json.get("videos", [])
+    images = analysis_json.get("images", [])
+    selected = dict(analysis_json)
+    selected["videos"] = _top_k(videos, user_prompt, top_k_videos)
+    selected["images"] = _top_k(images, user_prompt, top_k_images)
+
+    dropped = len(videos) + len(images) - len(selected["videos"]) - len(selected["images"])
+    if dropped:
+        print(
+            f"🔎 관련 미디어 선택: 영상 {len(selected['videos'])}/{len(videos)}, "
+            f"이미지 {len(selected['images'])}/{len(images)} ({dropped}개 제외)"
+        )
+    return selected
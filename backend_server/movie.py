@@ -1,19 +1,35 @@
-import os, re, json, unicodedata
-
-# ImageMagick 경로 설정 (Windows 전용)
-#os마다 다를 수 있으니 필요시 수정
-os.environ["IMAGEMAGICK_BINARY"] = r"C:\Program Files\ImageMagick-7.1.2-Q16-HDRI\magick.exe"
+import os, re, json, threading, unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from moviepy.editor import (
-    VideoFileClip, ImageClip, AudioFileClip, TextClip,
+    VideoFileClip, ImageClip, AudioFileClip,
     CompositeVideoClip, CompositeAudioClip
 )
+from proglog import ProgressBarLogger
+from pydantic import ValidationError
+from schemas import TimelineItem, TimelineOutput, TimelineDocument, TimelineItems, RenderItem
+from progress import no_progress
+from ffmpeg_render import render_with_ffmpeg
+from subtitle_render import subtitle_rgba, style_for_width
+from contact_sheet import build_contact_sheet
+from proxy_media import proxy_path
+from segment_render import render_segmented, RENDER_SEGMENTED
 
 
 
 # =============================
 # 전역 설정 & 유틸
 # =============================
-DEBUG = True
+# true면 파싱/드롭 사유 등 진단 로그 출력 (기본은 꺼서 일괄 렌더링 시 로그 비용 제거)
+DEBUG = os.getenv("RENDER_DEBUG", "false").lower() == "true"
+RENDER_TYPES = ("video", "image", "subtitle", "audio")
+# 렌더링 백엔드: moviepy(파이썬 합성) | ffmpeg(filter_complex 한 번으로 디코딩/합성/인코딩)
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "moviepy")
+# 타임라인 스트리밍 중 미디어를 미리 여는 스레드 수
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# 초안(draft) 렌더링: 낮은 해상도/fps + ultrafast 프리셋 + 전환 효과 없음 (컷 순서 확인용)
+DRAFT_WIDTH = int(os.getenv("DRAFT_WIDTH", "360"))
+DRAFT_FPS = int(os.getenv("DRAFT_FPS", "12"))
+DRAFT_PRESET = os.getenv("DRAFT_PRESET", "ultrafast")
 MEDIA_DIR  = "./media"
 RESULT_DIR = "./results"
 os.makedirs(MEDIA_DIR, exist_ok=True)
@@ -23,10 +39,20 @@ def dbg(*args):
     if DEBUG:
         print("[DBG]", *args)
 
-def safe_path(filename: str) -> str:
+def safe_path(filename: str, media_dir: str = None) -> str:
+    """
+    media_dir(작업 공간의 media 폴더)를 먼저 찾고, 없으면 기본 폴더에서 검색.
+    렌더링 해상도 프록시(media/_proxy)가 있으면 원본 대신 프록시 경로 반환
+    """
     if not filename:
         return ""
-    for base in [MEDIA_DIR, RESULT_DIR, "./temp", "."]:
+    bases = [MEDIA_DIR, RESULT_DIR, "./temp", "."]
+    if media_dir:
+        proxy = proxy_path(media_dir, filename)
+        if os.path.exists(proxy):
+            return proxy
+        bases.insert(0, media_dir)
+    for base in bases:
         p = os.path.join(base, filename)
         if os.path.exists(p):
             return p
@@ -41,13 +67,211 @@ def _normalize_str(s: str) -> str:
     return s
 
 
+class RenderProgressLogger(ProgressBarLogger):
+    """MoviePy 프레임 쓰기 진행('t' 바)을 progress('render', %) 콜백으로 전달"""
+
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar == "t" and attr == "index":
+            total = self.bars[bar]["total"] or 1
+            self.progress("render", 100 * (value + 1) / total, f"프레임 {value + 1}/{total}")
+
+
+# =============================
+# 소스 풀 (파일당 리더 1개 공유)
+# =============================
+class SourcePool:
+    """
+    렌더링 1회(또는 변형 일괄 렌더링) 동안 파일당 소스를 1개만 열어 공유:
+    - video: VideoFileClip (ffmpeg 리더 1개, 항목마다 subclip으로 구간만 다르게 사용)
+    - image: 로드 + 출력 해상도로 리사이즈한 ImageClip (한 번만 계산됨)
+    - audio: AudioFileClip
+    close()에서 연 리더를 모두 닫습니다. (렌더링 함수의 finally에서 호출)
+    """
+
+    def __init__(self, resolution=(1080, 1920)):
+        self.resolution = resolution
+        self._sources = {}   # (type, path) → clip
+        self._lock = threading.Lock()
+
+    def _load(self, t: str, path: str):
+        if t == "video":
+            return VideoFileClip(path)
+        if t == "audio":
+            return AudioFileClip(path)
+        return ImageClip(path).resize(self.resolution)
+
+    def get(self, t: str, path: str):
+        """(type, path)의 공유 소스 반환 (처음 요청될 때 열기)"""
+        key = (t, path)
+        source = self._sources.get(key)
+        if source is not None:
+            return source
+        source = self._load(t, path)
+        with self._lock:
+            existing = self._sources.setdefault(key, source)
+        if existing is not source and t != "image":
+            source.close()   # 다른 스레드가 먼저 연 경우
+        return existing
+
+    def close(self) -> None:
+        with self._lock:
+            sources, self._sources = list(self._sources.items()), {}
+        for (t, path), source in sources:
+            if t == "image":
+                continue
+            try:
+                source.close()
+            except Exception as e:
+                dbg(f"소스 닫기 실패: {path} ({e})")
+
+
+# =============================
+# 미디어 미리 열기 (타임라인 스트리밍과 겹쳐 실행)
+# =============================
+class MediaPrefetcher(SourcePool):
+    """
+    타임라인 항목이 도착할 때마다(submit) 백그라운드 스레드에서 SourcePool에 소스를 미리 준비:
+    - video: VideoFileClip 열기(ffmpeg 프로브) + 첫 프레임 디코딩
+    - image: 로드 + 출력 해상도로 리사이즈
+    렌더링은 같은 객체를 소스 풀로 사용하므로 get()이 준비된 소스를 그대로 돌려줍니다.
+    enabled=False이면 submit을 무시 (ffmpeg 백엔드처럼 미리 열 필요가 없을 때).
+    proxies(ProxyBuilder)를 주면 프록시가 아직 만들어지는 중인 파일은 건너뜀
+    (원본을 미리 열어도 렌더링은 프록시 경로로 다시 열게 되므로)
+    """
+
+    def __init__(
+        self, media_dir: str = None, resolution=(1080, 1920), max_workers: int = PREFETCH_WORKERS,
+        enabled: bool = True, proxies=None
+    ):
+        super().__init__(resolution)
+        self.enabled = enabled
+        self.proxies = proxies
+        self.media_dir = media_dir
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="prefetch")
+        self._futures = {}   # (type, path) → Future
+
+    def submit(self, item: dict) -> None:
+        t = str(item.get("type", "")).strip().lower()
+        if not self.enabled or t not in ("video", "image") or not item.get("filename"):
+            return
+        if self.proxies is not None and self.proxies.pending(item["filename"]):
+            dbg(f"prefetch 생략 (프록시 생성 중): {item['filename']}")
+            return
+        path = safe_path(item["filename"], self.media_dir)
+        if not os.path.exists(path):
+            return
+        with self._lock:
+            if (t, path) in self._futures:
+                return
+            dbg(f"prefetch: {t} {os.path.basename(path)}")
+            self._futures[(t, path)] = self._pool.submit(self._warm, t, path)
+
+    def _warm(self, t: str, path: str) -> None:
+        source = super().get(t, path)
+        if t == "video":
+            source.get_frame(0)
+
+    def get(self, t: str, path: str):
+        """미리 열기 중이면 끝날 때까지 기다린 뒤 공유 소스 반환 (미리 열기 실패 시 다시 열기)"""
+        future = self._futures.get((t, path))
+        if future is not None:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠️ 미리 열기 실패, 렌더링 시 다시 엽니다: {path} ({e})")
+        return super().get(t, path)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        self._futures.clear()
+        super().close()
+
+
+def draft_resolution(resolution=(1080, 1920)) -> tuple:
+    """가로 DRAFT_WIDTH에 맞춰 비율을 유지한 초안 해상도 (x264를 위해 짝수로 맞춤)"""
+    W, H = resolution
+    width = min(W, DRAFT_WIDTH)
+    return (width // 2 * 2, round(H * width / W / 2) * 2)
+
+
+def _in_point(item: RenderItem, source_duration, length: float) -> float:
+    """source_start(원본 안의 시작 초)를 원본 길이 안으로 보정 (없으면 0)"""
+    start = max(0.0, item.source_start or 0.0)
+    if source_duration:
+        start = min(start, max(0.0, source_duration - length))
+    return start
+
+
 # =============================
-# Timeline 문자열 파서 (강화 + 디버깅)
+# Timeline 파서 (검증 경로 1개 + 레거시 대체)
 # =============================
+def parse_timeline(timeline_json):
+    """
+    타임라인 → TimelineItem 리스트. 검증 경로는 하나:
+    - TimelineOutput / TimelineItem 리스트: 그대로 사용 (이미 검증됨)
+    - dict 리스트: TypeAdapter로 한 번에 검증
+    - JSON 문자열/bytes: pydantic-core JSON 파서로 바로 검증 (json.loads 후 재검증하지 않음)
+    - dict: "timeline" 키를 따라 내려감 ({story_summary, timeline} / 파이프라인 결과 {scenes, story, timeline})
+    검증에 실패하거나 형식을 알 수 없으면 None → collect_renderable이 레거시 파서로 대체
+    """
+    if isinstance(timeline_json, (TimelineOutput, TimelineDocument)):
+        return timeline_json.timeline
+    if isinstance(timeline_json, dict):
+        return parse_timeline(timeline_json["timeline"]) if "timeline" in timeline_json else None
+    try:
+        if isinstance(timeline_json, list):
+            if all(isinstance(item, TimelineItem) for item in timeline_json):
+                return timeline_json
+            return TimelineItems.validate_python(timeline_json)
+        if isinstance(timeline_json, (str, bytes)):
+            raw = timeline_json.strip()
+            first = raw[:1].decode() if isinstance(raw, bytes) else raw[:1]
+            if first == "[":
+                return TimelineItems.validate_json(raw)
+            if first == "{":
+                return TimelineDocument.model_validate_json(raw).timeline
+    except ValidationError as e:
+        dbg("타임라인 검증 실패:", e.error_count(), "건")
+    return None
+
+
+def _legacy_items(timeline_json, drop_reasons: dict) -> list:
+    """레거시 대체 경로: repr 문자열/느슨한 dict → 항목별로 검증해 통과한 TimelineItem만 반환"""
+    items = []
+    for i, raw in enumerate(parse_timeline_from_string(timeline_json)):
+        if isinstance(raw, TimelineItem):
+            items.append(raw)
+            continue
+        if not isinstance(raw, dict):
+            dbg(f"[DROP#{i}] dict가 아님 → {type(raw)}")
+            continue
+        t = str(raw.get("type", "")).strip().lower().replace("'", "").replace('"', '')
+        if not t:
+            drop_reasons["no_type"] += 1
+            dbg(f"[DROP#{i}] type 없음 → item:", raw)
+            continue
+        fields = dict(raw, type=t)
+        try:
+            items.append(TimelineItem.model_validate(fields))
+        except ValidationError:
+            try:
+                # source_start만 잘못된 경우는 원본 처음부터 사용
+                items.append(TimelineItem.model_validate(dict(fields, source_start=None)))
+            except ValidationError:
+                drop_reasons["no_time"] += 1
+                dbg(f"[DROP#{i}] start/end 없음 또는 변환 실패 → item:", raw)
+    return items
+
+
 def parse_timeline_from_string(timeline_json):
     """
-    LangChain에서 나온 'story_summary=... timeline=[TimelineItem(...), ...]' 문자열,
+    [레거시] LangChain에서 나온 'story_summary=... timeline=[TimelineItem(...), ...]' repr 문자열,
     혹은 이미 list/dict로 온 케이스를 모두 dict list로 변환.
+    parse_timeline() 검증에 실패했을 때만 _legacy_items()를 통해 사용됩니다.
     """
     dbg("parse_timeline_from_string: type =", type(timeline_json))
 
@@ -130,118 +354,175 @@ def parse_timeline_from_string(timeline_json):
 
 
 # =============================
-# 렌더링 메인 함수 (진단 로그 포함)
+# 렌더링 대상 수집 (검증 + 파일 확인)
 # =============================
-def render_shorts_from_timeline(
-    timeline_json,
-    output_path="results/final_shorts.mp4",
-    resolution=(1080, 1920),
-    fps=30
-):
-    print("🎬 Step 3. MoviePy 렌더링 시작...")
-
-    if hasattr(timeline_json, "model_dump"):
-        timeline_json = timeline_json.model_dump()
-
-    # 1) 파싱
-    timeline_data = parse_timeline_from_string(timeline_json)
-    if not isinstance(timeline_data, list):
-        dbg("timeline_data가 list가 아님 → type:", type(timeline_data))
-
-    dbg("timeline_data length:", len(timeline_data))
-    if timeline_data[:1]:
-        dbg("timeline_data sample[0]:", timeline_data[0])
+def collect_renderable(timeline_json, media_dir=None) -> list:
+    """
+    타임라인 → 검증을 통과한 RenderItem 리스트, start 순 정렬.
+    video/image/audio 항목에는 실제 파일 경로(path)를 채워 둠 (MoviePy/ffmpeg 백엔드 공용).
+    파일이 없는 audio(BGM)도 여기서 제외 → 두 백엔드와 구간 렌더링의 오디오 처리가 같아짐
+    """
+    drop_reasons = {"no_type":0, "bad_type":0, "no_time":0, "video_missing":0, "image_missing":0, "audio_missing":0, "subtitle_empty":0}
+    items = parse_timeline(timeline_json)
+    if items is None:
+        print("↩️ 타임라인 검증 실패 → 레거시 파서로 대체")
+        items = _legacy_items(timeline_json, drop_reasons)
 
-    # 2) 타입/필수키 검증 + drop 사유 로깅
     renderable = []
-    drop_reasons = {"no_type":0, "bad_type":0, "no_time":0, "video_missing":0, "image_missing":0, "subtitle_empty":0}
-    for i, item in enumerate(timeline_data):
-        if not isinstance(item, dict):
-            dbg(f"[DROP#{i}] dict가 아님 → {type(item)}")
-            continue
-        t = str(item.get("type", "")).strip().lower().replace("'", "").replace('"', '')
-        start = item.get("start", None)
-        end   = item.get("end", None)
-
-        if not t:
-            drop_reasons["no_type"] += 1
-            dbg(f"[DROP#{i}] type 없음 → item:", item)
-            continue
-        if t not in {"video", "image", "subtitle", "audio"}:
+    for item in items:
+        t = item.type.strip().lower()
+        if t not in RENDER_TYPES:
             drop_reasons["bad_type"] += 1
-            dbg(f"[DROP#{i}] 지원하지 않는 type='{t}' → item:", item)
             continue
-        if start is None or end is None:
-            drop_reasons["no_time"] += 1
-            dbg(f"[DROP#{i}] start/end 없음 → item:", item)
+        path = safe_path(item.filename, media_dir) if item.filename else ""
+        if t in ("video", "image", "audio") and (not item.filename or not os.path.exists(path)):
+            drop_reasons[f"{t}_missing"] += 1
+            dbg(f"[DROP] {t} 파일 없음 → filename={item.filename} / path={path}")
             continue
-
-        filename = item.get("filename")
-        if t == "video":
-            path = safe_path(filename)
-            if not filename or not os.path.exists(path):
-                drop_reasons["video_missing"] += 1
-                dbg(f"[DROP#{i}] 비디오 파일 없음 → filename={filename} / path={path}")
-                continue
-        if t == "image":
-            path = safe_path(filename)
-            if not filename or not os.path.exists(path):
-                drop_reasons["image_missing"] += 1
-                dbg(f"[DROP#{i}] 이미지 파일 없음 → filename={filename} / path={path}")
-                continue
-        if t == "subtitle":
-            if not str(item.get("text", "")).strip():
-                drop_reasons["subtitle_empty"] += 1
-                dbg(f"[DROP#{i}] 자막 text 없음 → item:", item)
-                continue
-
-        # 통과
-        norm = dict(item)
-        norm["type"] = t
-        try:
-            norm["start"] = float(start)
-            norm["end"]   = float(end)
-        except:
-            drop_reasons["no_time"] += 1
-            dbg(f"[DROP#{i}] start/end float 변환 실패 → item:", item)
+        if t == "subtitle" and not (item.text or "").strip():
+            drop_reasons["subtitle_empty"] += 1
             continue
-
-        renderable.append(norm)
+        renderable.append(RenderItem(t, item.start, item.end, item.filename, item.text, item.source_start, path))
 
     dbg("drop_reasons:", drop_reasons)
     print(f"✅ 렌더링 대상 {len(renderable)}개 항목 로드 완료")
-
     if not renderable:
         print("⚠️ 타임라인에 렌더링 가능한 video/image/subtitle이 없습니다.")
-        print(json.dumps(timeline_json, ensure_ascii=False, indent=2, default=str))
+
+    renderable.sort(key=lambda x: x.start)
+    return renderable
+
+
+# =============================
+# 렌더링 메인 함수 (진단 로그 포함)
+# =============================
+def render_shorts_from_timeline(
+    timeline_json,
+    output_path="results/final_shorts.mp4",
+    resolution=(1080, 1920),
+    fps=30,
+    media_dir=None,
+    progress=None,
+    prefetcher=None,
+    backend=None,
+    segmented=None,
+    draft=False,
+    contact_sheet_path=None
+):
+    """
+    prefetcher: MediaPrefetcher (타임라인 스트리밍 중 미리 열어 둔 소스 재사용, moviepy 백엔드 전용)
+    backend: "moviepy" | "ffmpeg" (None이면 RENDER_BACKEND)
+    segmented: True면 컷 경계로 나눈 구간을 프로세스 풀에서 병렬 렌더링 후 이어 붙임 (None이면 RENDER_SEGMENTED)
+    draft: True면 draft_resolution/DRAFT_FPS/DRAFT_PRESET, 전환 효과 없이 빠르게 미리보기 렌더링
+    contact_sheet_path: 지정하면 컷마다 썸네일 1장씩 이어 붙인 JPEG도 저장
+    """
+    backend = backend or RENDER_BACKEND
+    segmented = RENDER_SEGMENTED if segmented is None else segmented
+    progress = progress or no_progress
+    progress("render", 0, "렌더링 준비 중")
+
+    renderable = collect_renderable(timeline_json, media_dir)
+    if not renderable:
         return
 
-    # 3) 정렬 & 렌더링
-    renderable.sort(key=lambda x: x["start"])
+    if draft:
+        resolution, fps, segmented = draft_resolution(resolution), DRAFT_FPS, False
+        print(f"📝 초안 렌더링: {resolution[0]}x{resolution[1]} {fps}fps, {DRAFT_PRESET}, 전환 효과 없음")
+    preset = DRAFT_PRESET if draft else None
+
+    if segmented:
+        print(f"🎬 Step 3. 구간 병렬 렌더링 시작 ({backend})...")
+        render_segmented(renderable, output_path, resolution=resolution, fps=fps, backend=backend, progress=progress)
+        if contact_sheet_path:
+            _write_contact_sheet(renderable, contact_sheet_path, resolution)
+        progress("render", 100, "렌더링 완료")
+        print(f"✅ 최종 영상 생성 완료: {output_path}")
+        return
+
+    if backend == "ffmpeg":
+        print("🎬 Step 3. ffmpeg 렌더링 시작...")
+        render_with_ffmpeg(
+            renderable, output_path, resolution=resolution, fps=fps, progress=progress,
+            preset=preset, transitions=not draft
+        )
+        if contact_sheet_path:
+            _write_contact_sheet(renderable, contact_sheet_path, resolution)
+        progress("render", 100, "렌더링 완료")
+        print(f"✅ 최종 영상 생성 완료: {output_path}")
+        return
 
+    print("🎬 Step 3. MoviePy 렌더링 시작...")
+    # 같은 파일은 리더 1개를 공유 (미리 열기 객체가 있으면 그것을 풀로 사용)
+    own_pool = prefetcher is None or prefetcher.resolution != resolution
+    pool = SourcePool(resolution) if own_pool else prefetcher
+    try:
+        _render_with_moviepy(
+            renderable, output_path, resolution, fps, pool, progress, preset=preset or "fast", transitions=not draft
+        )
+        if contact_sheet_path:
+            _write_contact_sheet(renderable, contact_sheet_path, resolution, pool)
+    finally:
+        if own_pool:
+            pool.close()
+
+
+def _write_contact_sheet(renderable: list, output_path: str, resolution, pool: SourcePool = None) -> None:
+    """video/image 컷마다 대표 프레임(영상은 컷 시작 0.5초 지점) 1장씩 → build_contact_sheet"""
+    own_pool = pool is None
+    pool = pool or SourcePool(resolution)
+    frames = []
+    try:
+        cuts = [i for i in renderable if i.type in ("video", "image")]
+        for n, item in enumerate(cuts, start=1):
+            duration = item.duration
+            label = f"#{n} {item.start:.1f}-{item.end:.1f}s"
+            try:
+                if item.type == "video":
+                    source = pool.get("video", item.path)
+                    t = _in_point(item, source.duration, duration) + min(0.5, duration / 2)
+                    frame = source.get_frame(min(t, max(0.0, source.duration - 0.05)))
+                else:
+                    frame = pool.get("image", item.path).get_frame(0)
+                frames.append((frame, label))
+            except Exception as e:
+                print(f"⚠️ 썸네일 추출 실패: {item.filename} ({e})")
+        build_contact_sheet(frames, output_path)
+    finally:
+        if own_pool:
+            pool.close()
+
+
+def build_clips(renderable: list, resolution, pool: SourcePool, transitions: bool = True) -> tuple:
+    """렌더링 항목 → (영상/이미지/자막 클립 리스트, 오디오 트랙 리스트), transitions=False면 crossfadein 생략"""
     clips, audio_tracks = [], []
+    subtitle_style = style_for_width(resolution[0])
+    subtitle_y = resolution[1] - round(150 * resolution[1] / 1920)
     for item in renderable:
-        t        = item["type"]
-        start    = item["start"]
-        end      = item["end"]
-        duration = max(0.1, end - start)
-        filename = item.get("filename")
-        filepath = safe_path(filename)
+        t        = item.type
+        start    = item.start
+        end      = item.end
+        duration = item.duration
+        filename = item.filename
+        filepath = item.path
 
         # 🎞️ 동영상
         if t == "video":
             try:
-                clip = VideoFileClip(filepath).subclip(0, duration).resize(resolution)
-                clips.append(clip.set_start(start).crossfadein(0.2))
-                print(f"🎞️ 비디오 추가: {os.path.basename(filepath)} ({start}-{end}s)")
+                source = pool.get("video", filepath)
+                in_point = _in_point(item, source.duration, duration)
+                clip = source.subclip(in_point, min(in_point + duration, source.duration)).resize(resolution)
+                clip = clip.set_start(start)
+                clips.append(clip.crossfadein(0.2) if transitions else clip)
+                print(f"🎞️ 비디오 추가: {os.path.basename(filepath)} ({start}-{end}s, 원본 {in_point:.1f}s~)")
             except Exception as e:
                 print(f"⚠️ 비디오 로드 실패: {filepath} ({e})")
 
         # 🖼️ 이미지
         elif t == "image":
             try:
-                img = ImageClip(filepath, duration=duration).resize(resolution)
-                clips.append(img.set_start(start).crossfadein(0.3))
+                img = pool.get("image", filepath).set_duration(duration)
+                img = img.set_start(start)
+                clips.append(img.crossfadein(0.3) if transitions else img)
                 print(f"🖼️ 이미지 추가: {os.path.basename(filepath)} ({start}-{end}s)")
             except Exception as e:
                 print(f"⚠️ 이미지 로드 실패: {filepath} ({e})")
@@ -249,20 +530,15 @@ def render_shorts_from_timeline(
         # 💬 자막
         elif t == "subtitle":
             try:
-                txt = TextClip(
-                    item["text"],
-                    fontsize=60,
-                    color="white",
-                    font="C:/Windows/Fonts/malgun.ttf",  # Windows 한글 폰트
-                    method="caption",
-                    stroke_color="black",
-                    stroke_width=2,
-                    size=(1080, None)
-                ).set_position(("center", resolution[1] - 150)).set_start(start).set_duration(duration)
+                # Pillow로 래스터화한 자막 (같은 문장/스타일은 캐시 재사용, ImageMagick 불필요)
+                rgba = subtitle_rgba(item.text, width=resolution[0], **subtitle_style)
+                mask = ImageClip(rgba[:, :, 3] / 255.0, ismask=True)
+                txt = ImageClip(rgba[:, :, :3]).set_mask(mask)
+                txt = txt.set_position(("center", subtitle_y)).set_start(start).set_duration(duration)
                 clips.append(txt)
-                print(f"💬 자막 추가: '{item['text']}' ({start}-{end}s)")
+                print(f"💬 자막 추가: '{item.text}' ({start}-{end}s)")
             except Exception as e:
-                print(f"⚠️ 자막 렌더링 실패: {item.get('text')} ({e})")
+                print(f"⚠️ 자막 렌더링 실패: {item.text} ({e})")
         
         # 🎵 오디오
         elif t == "audio":
@@ -272,14 +548,24 @@ def render_shorts_from_timeline(
                     # filename = "default_bgm.mp3"
                     pass
                 if filename:
-                    path = safe_path(filename)
+                    path = filepath
                     if os.path.exists(path):
-                        aud = AudioFileClip(path).subclip(0, duration)
+                        source = pool.get("audio", path)
+                        in_point = _in_point(item, source.duration, duration)
+                        aud = source.subclip(in_point, min(in_point + duration, source.duration))
                         audio_tracks.append(aud.set_start(start))
                         print(f"🎵 오디오 추가: {os.path.basename(path)} ({start}-{end}s)")
             except Exception as e:
                 print(f"⚠️ 오디오 로드 실패: {filename} ({e})")
 
+    return clips, audio_tracks
+
+
+def _render_with_moviepy(
+    renderable: list, output_path: str, resolution, fps, pool: SourcePool, progress,
+    preset: str = "fast", transitions: bool = True
+) -> None:
+    clips, audio_tracks = build_clips(renderable, resolution, pool, transitions)
     if not clips:
         print("⚠️ 렌더링 가능한 클립이 없습니다. (필터는 통과했지만 clip 생성 실패)")
         return
@@ -291,6 +577,58 @@ def render_shorts_from_timeline(
 
     print(f"\n📦 렌더링 시작 → {output_path}")
     video.write_videofile(
-        output_path, codec="libx264", audio_codec="aac", fps=fps, preset="fast", threads=4
+        output_path, codec="libx264", audio_codec="aac", fps=fps, preset=preset, threads=4,
+        logger=RenderProgressLogger(progress) if progress is not no_progress else "bar"
     )
+    progress("render", 100, "렌더링 완료")
     print(f"✅ 최종 영상 생성 완료: {output_path}")
+
+
+# =============================
+# 변형 일괄 렌더링 (디코딩된 소스 공유)
+# =============================
+def render_variants(
+    timelines: list,
+    output_paths: list,
+    resolution=(1080, 1920),
+    fps=30,
+    media_dir=None,
+    progress=None,
+    prefetcher=None,
+    backend=None
+):
+    """
+    여러 타임라인을 차례로 렌더링하면서 MediaPrefetcher 하나를 공유:
+    같은 영상은 한 번만 열고(ffmpeg 리더 재사용), 같은 이미지는 한 번만 로드/리사이즈.
+    render 진행률은 변형 수로 나눠 이어서 보고합니다.
+    """
+    progress = progress or no_progress
+    # ffmpeg 백엔드는 소스를 직접 디코딩하므로 미리 열 필요 없음
+    own_prefetcher = prefetcher is None and (backend or RENDER_BACKEND) == "moviepy"
+    if own_prefetcher:
+        prefetcher = MediaPrefetcher(media_dir=media_dir, resolution=resolution)
+    parsed = []
+    for timeline in timelines:
+        items = parse_timeline(timeline)
+        if items is None:
+            parsed.append(timeline)   # 렌더링 시 레거시 파서로 대체
+            continue
+        if prefetcher:
+            for item in items:
+                prefetcher.submit({"type": item.type, "filename": item.filename})
+        parsed.append(items)
+
+    count = len(parsed)
+    try:
+        for index, (items, output_path) in enumerate(zip(parsed, output_paths)):
+            def variant_progress(stage, percent, message="", index=index):
+                progress(stage, (index + percent / 100) * 100 / count, f"변형 {index + 1}/{count} {message}")
+
+            print(f"\n🎬 변형 {index + 1}/{count} 렌더링 → {output_path}")
+            render_shorts_from_timeline(
+                items, output_path=output_path, resolution=resolution, fps=fps, media_dir=media_dir,
+                progress=variant_progress, prefetcher=prefetcher, backend=backend
+            )
+    finally:
+        if own_prefetcher:
+            prefetcher.close()
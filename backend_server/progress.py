@@ -0,0 +1,83 @@
+import time
+
+# ============================================================
+# 0️⃣ 단계 정의 (순서 + 전체 진행률 가중치)
+# ============================================================
+STAGES = [
+    ("upload", 0.03),
+    ("vision", 0.30),
+    ("scenes", 0.07),
+    ("story", 0.06),
+    ("emotion_hook", 0.06),
+    ("timeline", 0.10),
+    ("render", 0.38),
+]
+_ORDER = [name for name, _ in STAGES]
+_WEIGHT = dict(STAGES)
+
+# 같은 단계의 진행 이벤트는 이 간격(초)보다 자주 저장하지 않음 (0%/100%는 항상 저장)
+MIN_EVENT_INTERVAL = 0.5
+
+
+def no_progress(stage: str, percent: float, message: str = "") -> None:
+    """progress 콜백을 받지 않았을 때의 기본값"""
+
+
+# ============================================================
+# 1️⃣ 작업 진행 리포터
+# ============================================================
+class ProgressReporter:
+    """
+    progress(stage, percent, message) 형태로 호출하면
+    단계/전체 진행률, 경과 시간, 예상 남은 시간을 계산해 JobStore 이벤트로 저장.
+    어떤 단계가 보고되면 STAGES에서 그 앞의 단계는 모두 끝난 것으로 봅니다.
+    """
+
+    def __init__(self, job_id: str, store, started: float = None):
+        self.job_id = job_id
+        self.store = store
+        self.started = started or time.time()
+        self.timings = {}          # 단계별 소요 시간(초)
+        self._stage_started = {}
+        self._last_emit = {}
+
+    def __call__(self, stage: str, percent: float, message: str = "") -> None:
+        now = time.time()
+        percent = max(0.0, min(100.0, float(percent)))
+        # 첫 단계(upload)는 끝날 때 한 번만 보고되므로 리포터 시작 시각부터 측정
+        stage_started = self._stage_started.setdefault(stage, self.started if stage == _ORDER[0] else now)
+
+        if 0 < percent < 100 and now - self._last_emit.get(stage, 0) < MIN_EVENT_INTERVAL:
+            return
+        self._last_emit[stage] = now
+
+        stage_elapsed = now - stage_started
+        if percent >= 100:
+            self.timings[stage] = round(stage_elapsed, 3)
+
+        overall = self.overall_percent(stage, percent)
+        elapsed = now - self.started
+        self.store.add_event(self.job_id, {
+            "stage": stage,
+            "percent": round(percent, 1),
+            "overall_percent": round(overall, 1),
+            "stage_elapsed": round(stage_elapsed, 2),
+            "stage_eta": _eta(stage_elapsed, percent),
+            "elapsed": round(elapsed, 2),
+            "eta": _eta(elapsed, overall),
+            "message": message,
+        })
+
+    @staticmethod
+    def overall_percent(stage: str, percent: float) -> float:
+        if stage not in _WEIGHT:
+            return 0.0
+        done = sum(_WEIGHT[s] for s in _ORDER[:_ORDER.index(stage)])
+        return min(100.0, (done + _WEIGHT[stage] * percent / 100) * 100)
+
+
+def _eta(elapsed: float, percent: float):
+    """지금까지의 속도로 계산한 남은 시간(초), 아직 추정 불가면 None"""
+    if percent <= 0:
+        return None
+    return round(elapsed * (100 - percent) / percent, 1)
@@ -0,0 +1,175 @@
+import os, re, json
+from collections import Counter
+from functools import lru_cache
+import tiktoken
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+TOKEN_MODEL = os.getenv("TOKEN_MODEL", "gpt-4o")
+# 단계별 analysis_json 토큰 예산 (0이면 압축하지 않음)
+PROMPT_BUDGETS = {
+    "scenes": int(os.getenv("PROMPT_BUDGET_SCENES", "6000")),
+    "timeline": int(os.getenv("PROMPT_BUDGET_TIMELINE", "4000")),
+}
+# keyphrase: 핵심 문장 추출 / truncate: 앞부분만 남김
+PROMPT_COMPACT_MODE = os.getenv("PROMPT_COMPACT_MODE", "keyphrase")
+# 파일 1개 description에 최소한 남길 토큰 수
+MIN_DESCRIPTION_TOKENS = 24
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?。])\s+|\n+")
+_WORD_RE = re.compile(r"\w{2,}")
+
+
+# ============================================================
+# 1️⃣ 토큰 계산
+# ============================================================
+class _ApproxEncoder:
+    """tiktoken 인코딩 파일을 받을 수 없을 때(오프라인 등) 쓰는 근사치: 약 2글자 = 1토큰"""
+
+    def encode(self, text: str) -> list:
+        return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+    def decode(self, tokens: list) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=1)
+def get_encoder():
+    try:
+        try:
+            return tiktoken.encoding_for_model(TOKEN_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"⚠️ tiktoken 인코딩 로드 실패, 글자 수 기반 근사치 사용: {e}")
+        return _ApproxEncoder()
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoder().encode(text or ""))
+
+
+# ============================================================
+# 2️⃣ description 압축
+# ============================================================
+def _truncate(text: str, budget: int) -> str:
+    tokens = get_encoder().encode(text)
+    return get_encoder().decode(tokens[:budget]).rstrip() + "…"
+
+
+def _keyphrase(text: str, budget: int) -> str:
+    """자주 나오는 단어를 많이 포함한 문장부터 예산 안에서 고르고 원래 순서로 이어 붙임"""
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+    if len(sentences) <= 1:
+        return _truncate(text, budget)
+
+    freq = Counter(w.lower() for w in _WORD_RE.findall(text))
+    scored = []
+    for i, sent in enumerate(sentences):
+        words = [w.lower() for w in _WORD_RE.findall(sent)]
+        score = sum(freq[w] for w in set(words)) / (len(words) ** 0.5 or 1)
+        scored.append((score, i, sent, count_tokens(sent)))
+    scored.sort(key=lambda x: (-x[0], x[1]))
+
+    chosen, used, seen = [], 0, set()
+    for _, i, sent, n in scored:
+        if sent not in seen and used + n <= budget:
+            chosen.append((i, sent))
+            seen.add(sent)
+            used += n
+    if not chosen:
+        return _truncate(sentences[0], budget)
+    return " ".join(sent for _, sent in sorted(chosen))
+
+
+@lru_cache(maxsize=4096)
+def compact_text(text: str, budget: int, mode: str = PROMPT_COMPACT_MODE) -> str:
+    """description 하나를 budget 토큰 이하로 압축 (같은 입력은 메모리 캐시 재사용)"""
+    if count_tokens(text) <= budget:
+        return text
+    if mode == "truncate":
+        return _truncate(text, budget)
+    return _keyphrase(text, budget)
+
+
+def _allocate(lengths: list, budget: int, costs: list = None) -> list:
+    """
+    전체 예산을 파일별로 분배 (water-filling, 합계(costs 포함)는 항상 budget 이하):
+    1) 앞(우선순위가 높은) 파일부터 항목 자체 비용(costs: filename 등 JSON 구조) +
+       최소 MIN_DESCRIPTION_TOKENS(더 짧으면 그 길이)씩 배정, 예산이 모자라면 그 뒤 파일은 0 (프롬프트에서 제외)
+    2) 남은 예산은 짧은 description은 그대로 두고 긴 description끼리 균등하게 나눔
+    """
+    costs = costs or [0] * len(lengths)
+    alloc = [0] * len(lengths)
+    remaining = budget
+    kept = []
+    for i, n in enumerate(lengths):
+        floor = min(n, MIN_DESCRIPTION_TOKENS)
+        if costs[i] + floor > remaining:
+            break
+        alloc[i] = floor
+        remaining -= costs[i] + floor
+        kept.append(i)
+
+    order = sorted(kept, key=lambda i: lengths[i] - alloc[i])
+    for rank, i in enumerate(order):
+        share = remaining // (len(order) - rank)
+        extra = min(lengths[i] - alloc[i], share)
+        alloc[i] += extra
+        remaining -= extra
+    return alloc
+
+
+# ============================================================
+# 3️⃣ analysis_json 예산 맞추기
+# ============================================================
+def compact_analysis(analysis_json: dict, stage: str, budget: int = None, mode: str = PROMPT_COMPACT_MODE) -> dict:
+    """
+    analysis_json을 직렬화했을 때 토큰 수가 stage 예산을 넘으면
+    videos/images/audio의 description을 압축한 사본을 반환 (원본은 변경하지 않음).
+    파일마다 최소 토큰도 줄 수 없으면 audio → videos → images 순서로 뒤쪽 항목을 제외
+    """
+    budget = PROMPT_BUDGETS.get(stage, 0) if budget is None else budget
+    before = count_tokens(json.dumps(analysis_json, ensure_ascii=False))
+    if not budget or before <= budget:
+        print(f"🔢 [{stage}] analysis_json {before} 토큰 (예산 {budget or '∞'}) → 압축 없음")
+        return analysis_json
+
+    # 앞쪽 항목일수록 우선순위가 높음 (오디오는 보통 1~2개라 먼저, 영상은 이미지보다 설명이 중요)
+    entries = [
+        (key, idx, item.get("description") or "")
+        for key in ("audio", "videos", "images")
+        for idx, item in enumerate(analysis_json.get(key, []))
+    ]
+    lengths = [count_tokens(desc) for _, _, desc in entries]
+    # 항목별 JSON 구조(filename 등) 비용 — 제외된 항목은 이 비용도 빠짐
+    costs = [
+        count_tokens(json.dumps(dict(analysis_json[key][idx], description=""), ensure_ascii=False)) + 1
+        for key, idx, _ in entries
+    ]
+    overhead = before - sum(lengths) - sum(costs)
+    alloc = _allocate(lengths, max(0, budget - overhead), costs)
+
+    compacted = dict(analysis_json)
+    for key in ("videos", "images", "audio"):
+        compacted[key] = [dict(item) for item in analysis_json.get(key, [])]
+    dropped = set()
+    for (key, idx, desc), n in zip(entries, alloc):
+        if desc and n <= 0:
+            dropped.add((key, idx))
+        elif desc:
+            compacted[key][idx]["description"] = compact_text(desc, n, mode)
+    if dropped:
+        for key in ("videos", "images", "audio"):
+            compacted[key] = [item for idx, item in enumerate(compacted[key]) if (key, idx) not in dropped]
+
+    after = count_tokens(json.dumps(compacted, ensure_ascii=False))
+    print(
+        f"✂️ [{stage}] analysis_json {before} → {after} 토큰 (예산 {budget}, {before - after} 토큰 절감, {mode}"
+        f"{f', {len(dropped)}개 항목 제외' if dropped else ''})"
+    )
+    if after > budget:
+        # 압축 문장 끝의 "…"와 JSON 이스케이프로 약간 넘을 수 있음
+        print(f"⚠️ [{stage}] 압축 후에도 예산 초과: {after} > {budget} 토큰")
+    return compacted
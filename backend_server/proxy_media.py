@@ -0,0 +1,169 @@
+import os, json, subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+from PIL import Image, ImageOps
+from file_utils import check_file_type
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+PROXY_ENABLED = os.getenv("PROXY_ENABLED", "true").lower() == "true"
+PROXY_WORKERS = int(os.getenv("PROXY_WORKERS", "2"))
+PROXY_CRF = os.getenv("PROXY_CRF", "18")
+PROXY_PRESET = os.getenv("PROXY_PRESET", "veryfast")
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+PROXY_DIR_NAME = "_proxy"
+
+
+# ============================================================
+# 1️⃣ 경로 / 크기
+# ============================================================
+def proxy_path(media_dir: str, filename: str) -> str:
+    """media_dir/_proxy/ 아래 프록시 경로 (영상은 .mp4 컨테이너로 통일)"""
+    name = os.path.basename(filename)
+    if check_file_type(name) == "video":
+        name += ".mp4"
+    return os.path.join(media_dir, PROXY_DIR_NAME, name)
+
+
+def proxy_scale(width: int, height: int, resolution) -> float:
+    """
+    비율을 유지하면서 렌더링 해상도를 덮는 최소 배율 (확대는 하지 않음).
+    렌더러의 resize(resolution)는 프록시에서 축소만 하게 되므로 원본과 같은 화질
+    """
+    W, H = resolution
+    return min(1.0, max(W / width, H / height))
+
+
+def video_size(path: str) -> tuple:
+    """첫 영상 스트림의 (가로, 세로) — ffprobe 1회, 알 수 없으면 None"""
+    try:
+        out = subprocess.run(
+            [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+             "-of", "json", path],
+            capture_output=True, text=True, timeout=30,
+        )
+        stream = (json.loads(out.stdout or "{}").get("streams") or [{}])[0]
+        return int(stream["width"]), int(stream["height"])
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _is_fresh(src: str, dst: str) -> bool:
+    return os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src)
+
+
+# ============================================================
+# 2️⃣ 프록시 생성 (임시 파일 → os.replace로 원자적 교체)
+# ============================================================
+def make_image_proxy(src: str, dst: str, resolution=(1080, 1920)) -> bool:
+    """
+    EXIF 회전을 반영(표시 방향 기준)해 렌더링 해상도로 축소한 이미지 프록시.
+    Vision 전처리(load_image_for_vision)와 같은 방향을 쓰므로 세로 사진이 눕혀져 렌더링되지 않음.
+    이미 충분히 작고 회전 태그도 없는 이미지는 만들지 않음 (False)
+    """
+    with Image.open(src) as img:
+        rotated = img.getexif().get(0x0112, 1) not in (0, 1)   # 0x0112 = Orientation
+        img = ImageOps.exif_transpose(img)
+        scale = proxy_scale(*img.size, resolution)
+        if scale >= 1.0 and not rotated:
+            return False
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        resized = img.resize(size, Image.LANCZOS) if scale < 1.0 else img
+        fmt = "PNG" if src.lower().endswith(".png") else "JPEG"
+        if fmt == "JPEG" and resized.mode not in ("RGB", "L"):
+            resized = resized.convert("RGB")
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        # exif_transpose가 Orientation을 지운 EXIF를 유지 (회전은 픽셀에 이미 반영됨)
+        resized.save(tmp, format=fmt, quality=92, exif=img.getexif())
+    os.replace(tmp, dst)
+    return True
+
+
+def make_video_proxy(src: str, dst: str, resolution=(1080, 1920)) -> bool:
+    """
+    렌더링 해상도로 축소한 H.264 프록시.
+    1초마다 키프레임(-force_key_frames) → subclip/-ss 탐색이 빠름, +faststart.
+    이미 렌더링 해상도 이하인 영상은 이미지와 같이 만들지 않음 (False)
+    """
+    size = video_size(src)
+    if size and proxy_scale(*size, resolution) >= 1.0:
+        return False
+    W, H = resolution
+    factor = f"min(1,max({W}/iw,{H}/ih))"
+    vf = f"scale=w='trunc(iw*{factor}/2)*2':h='trunc(ih*{factor}/2)*2'"
+    tmp = f"{dst}.{os.getpid()}.tmp.mp4"
+    cmd = [
+        FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", "-i", src,
+        "-vf", vf, "-c:v", "libx264", "-preset", PROXY_PRESET, "-crf", PROXY_CRF, "-pix_fmt", "yuv420p",
+        "-force_key_frames", "expr:gte(t,n_forced*1)", "-c:a", "aac", "-movflags", "+faststart", tmp,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise RuntimeError(result.stderr[-1000:])
+    os.replace(tmp, dst)
+    return True
+
+
+def make_proxy(media_dir: str, filename: str, resolution=(1080, 1920)) -> str:
+    """파일 1개의 프록시 생성 (이미 최신이면 생략) → 프록시 경로, 만들 필요가 없으면 None"""
+    src = os.path.join(media_dir, filename)
+    dst = proxy_path(media_dir, filename)
+    if _is_fresh(src, dst):
+        return dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    kind = check_file_type(filename)
+    made = make_video_proxy(src, dst, resolution) if kind == "video" else make_image_proxy(src, dst, resolution)
+    return dst if made else None
+
+
+# ============================================================
+# 3️⃣ 백그라운드 생성 (분석/LLM 단계와 동시에 실행)
+# ============================================================
+class ProxyBuilder:
+    """
+    start()로 업로드 파일의 프록시 생성을 백그라운드 스레드에서 시작하고,
+    렌더링 직전에 wait()으로 완료를 기다림. 실패한 파일은 원본으로 렌더링됩니다.
+    """
+
+    def __init__(self, media_dir: str, resolution=(1080, 1920), max_workers: int = PROXY_WORKERS):
+        self.media_dir = media_dir
+        self.resolution = resolution
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="proxy")
+        self._futures = {}
+
+    def start(self, files: list = None) -> "ProxyBuilder":
+        if not PROXY_ENABLED:
+            return self
+        files = files if files is not None else sorted(os.listdir(self.media_dir))
+        for filename in files:
+            if check_file_type(filename) in ("video", "image"):
+                self._futures[filename] = self._pool.submit(make_proxy, self.media_dir, filename, self.resolution)
+        return self
+
+    def pending(self, filename: str) -> bool:
+        """filename의 프록시가 아직 만들어지는 중인지 (끝나면 safe_path가 프록시 경로를 돌려줌)"""
+        future = self._futures.get(filename)
+        return future is not None and not future.done()
+
+    def close(self) -> None:
+        """아직 시작하지 않은 프록시 작업은 취소하고 스레드 풀 종료 (wait() 뒤에 불러도 됨)"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def wait(self) -> dict:
+        """모든 프록시 생성이 끝날 때까지 기다린 뒤 {filename: 프록시 경로 또는 None}"""
+        wait(list(self._futures.values()))
+        self._pool.shutdown(wait=True)
+        results = {}
+        for filename, future in self._futures.items():
+            try:
+                results[filename] = future.result()
+            except Exception as e:
+                print(f"⚠️ 프록시 생성 실패, 원본 사용: {filename} ({e})")
+                results[filename] = None
+        made = sum(1 for p in results.values() if p)
+        if results:
+            print(f"🪶 렌더링용 프록시 {made}/{len(results)}개 준비 완료")
+        return results
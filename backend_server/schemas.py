@@ -0,0 +1,101 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+
+# ============================================================
+# 1️⃣ Pydantic Schemas (LLM 구조화 출력 / 타임라인 저장 형식)
+# ============================================================
+class SceneItem(BaseModel):
+    scene_id: int
+    summary: str
+    highlight: str
+
+
+class ScenesOutput(BaseModel):
+    scenes: List[SceneItem] = Field(default_factory=list)
+
+
+class StoryIdeaOutput(BaseModel):
+    tone: str
+    opening: str
+    development: str
+    closing: str
+    key_message: str
+    opening_sec: int
+    development_sec: int
+    closing_sec: int
+
+
+class TimelineItem(BaseModel):
+    type: str
+    filename: Optional[str] = None
+    text: Optional[str] = None
+    start: float
+    end: float
+    source_start: Optional[float] = None  # video/audio 원본 안의 시작 위치(초), 없으면 0
+
+
+class TimelineOutput(BaseModel):
+    story_summary: str
+    timeline: List[TimelineItem]
+
+class EmotionOutput(BaseModel):
+    emotion_story: str
+
+class HookOutput(BaseModel):
+    hook_line: str
+
+
+class TimelineDocument(BaseModel):
+    """저장된 타임라인 JSON / 파이프라인 결과 (story_summary, scenes 등 다른 필드는 무시하고 timeline만 검증)"""
+    timeline: List[TimelineItem]
+
+
+# 저장된 JSON/dict 리스트를 한 번에 검증 (pydantic-core, 항목마다 모델 생성 오버헤드 없음)
+TimelineItems = TypeAdapter(List[TimelineItem])
+
+
+def split_duration(total: int) -> dict:
+    """총 길이를 도입, 전개, 결말로 분할 (LangChain 없이 쓰는 fast 모드와 공유)"""
+    opening = int(total * 0.3)
+    development = int(total * 0.5)
+    closing = total - opening - development
+    return {
+        "opening_sec": opening,
+        "development_sec": development,
+        "closing_sec": closing
+    }
+
+
+# ============================================================
+# 2️⃣ 렌더링 내부 표현
+# ============================================================
+class RenderItem:
+    """
+    검증·경로 확인을 마친 렌더링 항목 1개.
+    __slots__로 dict보다 작고 속성 접근이 빠름 (긴 타임라인 / 변형·구간 일괄 렌더링용)
+    """
+
+    __slots__ = ("type", "filename", "text", "start", "end", "source_start", "path")
+
+    def __init__(
+        self, type: str, start: float, end: float, filename: str = None, text: str = None,
+        source_start: float = None, path: str = ""
+    ):
+        self.type = type
+        self.start = start
+        self.end = end
+        self.filename = filename
+        self.text = text
+        self.source_start = source_start
+        self.path = path
+
+    @property
+    def duration(self) -> float:
+        return max(0.1, self.end - self.start)
+
+    def shifted(self, start: float, end: float) -> "RenderItem":
+        """같은 소스/자막을 다른 구간(start~end)에 놓은 사본 (구간 렌더링용)"""
+        return RenderItem(self.type, start, end, self.filename, self.text, self.source_start, self.path)
+
+    def __repr__(self) -> str:
+        return f"RenderItem({self.type}, {self.start:.2f}-{self.end:.2f}, {self.filename or self.text!r})"
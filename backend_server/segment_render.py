@@ -0,0 +1,318 @@
+import os, glob, shutil, subprocess, tempfile, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from disk_cache import make_cache_key
+from file_utils import file_sha256
+import ffmpeg_render, subtitle_render
+from ffmpeg_render import FFMPEG_BINARY, render_with_ffmpeg
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+RENDER_SEGMENTED = os.getenv("RENDER_SEGMENTED", "false").lower() == "true"
+SEGMENT_WORKERS = int(os.getenv("SEGMENT_WORKERS", str(os.cpu_count() or 2)))
+# 이보다 짧은 구간은 다음 구간과 합침 (프로세스/인코더 시작 비용이 더 큼)
+SEGMENT_MIN_SEC = float(os.getenv("SEGMENT_MIN_SEC", "2"))
+AUDIO_FPS = 44100
+VISUAL_TYPES = ("video", "image")
+MOVIEPY_PRESET = "fast"
+
+# 인코딩된 구간 캐시 (입력이 같은 구간은 다시 인코딩하지 않음)
+SEGMENT_CACHE_ENABLED = os.getenv("SEGMENT_CACHE_ENABLED", "true").lower() == "true"
+SEGMENT_CACHE_DIR = os.path.join(os.getenv("CACHE_DIR", "cache"), "segments")
+SEGMENT_CACHE_MAX_MB = int(os.getenv("SEGMENT_CACHE_MAX_MB", "2048"))
+# 구간 렌더링 방식(연출 값 등)이 바뀌면 올려서 기존 캐시를 무효화
+SEGMENT_CACHE_VERSION = 2
+
+
+# ============================================================
+# 1️⃣ 구간 나누기 (컷 경계 중 겹치는 컷이 없는 곳만)
+# ============================================================
+def _frame(t: float, fps: int) -> int:
+    """시각 → 가장 가까운 프레임 번호 (구간 경계는 정수 프레임으로 다뤄 float 오차로 프레임이 늘지 않게 함)"""
+    return int(round(t * fps))
+
+
+def split_segments(renderable: list, fps: int = 30, min_sec: float = SEGMENT_MIN_SEC) -> list:
+    """
+    collect_renderable() 결과 → [(시작 프레임, 끝 프레임, 구간 항목 리스트), ...]
+    - 구간 n0~n1은 정확히 n1 - n0 프레임 (시각은 n0 / fps)
+    - 경계 후보는 video/image 컷의 시작 시각. 그 앞에서 시작한 컷이 경계를 넘어가면
+      (crossfadein이 앞 컷 위에서 일어나는 경우) 경계로 쓰지 않아 두 컷이 같은 구간에 들어감
+    - 자막은 구간 경계에서 잘라 나눔, audio 항목은 구간에 넣지 않음 (전체 길이로 한 번만 렌더링)
+    - 항목 시각은 구간 시작 기준으로 옮김 (source_start는 그대로)
+    """
+    visuals = sorted((i for i in renderable if i.type in VISUAL_TYPES), key=lambda i: i.start)
+    subtitles = [i for i in renderable if i.type == "subtitle"]
+    total = _frame(max((i.end for i in visuals + subtitles), default=0.0), fps)
+    if total <= 0:
+        return []
+
+    eps = 0.5 / fps
+    min_frames = min_sec * fps
+    cuts, reach = [0], 0.0
+    for item in visuals:
+        b = _frame(item.start, fps)
+        if cuts[-1] < b < total and reach <= b / fps + eps:
+            cuts.append(b)
+        reach = max(reach, item.end)
+    cuts.append(total)
+
+    # 짧은 구간 합치기 (마지막 구간이 짧으면 앞 구간에 붙임)
+    bounds = [cuts[0]]
+    for b in cuts[1:-1]:
+        if b - bounds[-1] >= min_frames:
+            bounds.append(b)
+    if len(bounds) > 1 and total - bounds[-1] < min_frames:
+        bounds.pop()
+    bounds.append(total)
+
+    segments = []
+    for n0, n1 in zip(bounds, bounds[1:]):
+        s0, s1 = n0 / fps, n1 / fps
+        items = []
+        for item in visuals:
+            if n0 <= _frame(item.start, fps) < n1:
+                items.append(item.shifted(max(0.0, item.start - s0), item.end - s0))
+        for item in subtitles:
+            start, end = max(item.start, s0), min(item.end, s1)
+            if end - start > eps:
+                items.append(item.shifted(start - s0, end - s0))
+        items.sort(key=lambda x: x.start)
+        segments.append((n0, n1, items))
+    return segments
+
+
+# ============================================================
+# 2️⃣ 구간 캐시 (입력 해시 → 인코딩된 mp4, 사용 시각(mtime) 기준 LRU)
+# ============================================================
+def _render_settings(backend: str, resolution, fps: int) -> dict:
+    """구간 결과에 영향을 주는 출력/인코더/연출 설정"""
+    return {
+        "version": SEGMENT_CACHE_VERSION, "backend": backend, "resolution": list(resolution), "fps": fps,
+        "codec": "libx264", "preset": ffmpeg_render.FFMPEG_PRESET if backend == "ffmpeg" else MOVIEPY_PRESET,
+        "fade": [ffmpeg_render.VIDEO_FADE_SEC, ffmpeg_render.IMAGE_FADE_SEC],
+        "subtitle": [
+            subtitle_render.find_font(), subtitle_render.FONT_SIZE, subtitle_render.TEXT_COLOR,
+            subtitle_render.STROKE_COLOR, subtitle_render.STROKE_WIDTH, subtitle_render.LINE_SPACING,
+            ffmpeg_render.SUBTITLE_BOTTOM_OFFSET,
+        ],
+    }
+
+
+def segment_key(items: list, frames: int, settings: dict) -> str:
+    """
+    구간 항목(구간 기준 시각) + 프레임 수 + 설정 → 캐시 키.
+    파일은 경로가 아니라 내용 해시로 비교하므로 같은 이미지를 다시 올려도 재사용됨
+    """
+    parts = []
+    for item in items:
+        part = [item.type, round(item.start, 3), round(item.end, 3)]
+        if item.type == "subtitle":
+            part.append(str(item.text or ""))
+        else:
+            part += [file_sha256(item.path), round(item.source_start or 0.0, 3)]
+        parts.append(part)
+    return make_cache_key("segment", settings, frames, parts)
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(SEGMENT_CACHE_DIR, f"{key}.mp4")
+
+
+def _lookup_segment(key: str):
+    path = _cache_path(key)
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    return None
+
+
+def _store_segment(key: str, rendered_path: str) -> str:
+    """작업 폴더의 구간 파일을 캐시로 옮김 (같은 파일시스템이 아닐 수 있어 복사 후 os.replace)"""
+    path = _cache_path(key)
+    os.makedirs(SEGMENT_CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.copyfile(rendered_path, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def _prune_segment_cache(keep: set = ()) -> None:
+    """총 용량이 SEGMENT_CACHE_MAX_MB를 넘으면 오래 사용하지 않은(mtime) 구간부터 삭제 (keep은 제외)"""
+    files = [(p, os.stat(p)) for p in glob.glob(os.path.join(SEGMENT_CACHE_DIR, "*.mp4"))]
+    excess = sum(st.st_size for _, st in files) - SEGMENT_CACHE_MAX_MB * 1024 * 1024
+    for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+        if excess <= 0:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+            excess -= st.st_size
+        except OSError:
+            pass
+
+
+# ============================================================
+# 3️⃣ 구간 렌더링 (프로세스 풀 작업 함수, 영상 트랙만)
+# ============================================================
+def _render_segment(args: tuple) -> str:
+    """구간 1개를 정확히 frames 프레임으로 인코딩"""
+    items, path, resolution, fps, backend, frames, threads = args
+    if backend == "ffmpeg":
+        render_with_ffmpeg(items, path, resolution=resolution, fps=fps, audio=False, length=frames / fps, frames=frames)
+        return path
+
+    # movie가 이 모듈을 import하므로 순환 import를 피하기 위해 함수 안에서 import
+    from moviepy.editor import CompositeVideoClip
+    from movie import SourcePool, build_clips
+
+    pool = SourcePool(resolution)
+    try:
+        clips, _ = build_clips(items, resolution, pool)
+        # MoviePy는 np.arange(0, duration, 1/fps) 시각의 프레임을 쓰므로 반 프레임 짧게 잡아야 정확히 frames개
+        video = CompositeVideoClip(clips, size=resolution).set_duration((frames - 0.5) / fps)
+        video.write_videofile(
+            path, codec="libx264", fps=fps, preset=MOVIEPY_PRESET, threads=threads, audio=False, logger=None
+        )
+    finally:
+        pool.close()
+    return path
+
+
+def _render_audio(renderable: list, path: str, total: float) -> bool:
+    """
+    전체 길이 오디오를 한 번만 렌더링 (MoviePy 경로와 같은 규칙:
+    audio 항목이 있으면 그것만, 없으면 영상 클립 소리 합성) → 소리가 없으면 False
+    """
+    from moviepy.editor import CompositeAudioClip
+    from movie import SourcePool, _in_point
+
+    audios = [i for i in renderable if i.type == "audio" and i.path]
+    kind = "audio" if audios else "video"
+    sources = audios or [i for i in renderable if i.type == "video"]
+
+    pool = SourcePool((0, 0))
+    try:
+        tracks = []
+        for item in sources:
+            length = max(0.1, item.end - item.start)
+            try:
+                source = pool.get(kind, item.path)
+                in_point = _in_point(item, source.duration, length)
+                clip = source.subclip(in_point, min(in_point + length, source.duration))
+            except Exception as e:
+                print(f"⚠️ 오디오 로드 실패: {item.filename} ({e})")
+                continue
+            track = clip if kind == "audio" else clip.audio
+            if track is not None:
+                tracks.append(track.set_start(item.start))
+        if not tracks:
+            return False
+        CompositeAudioClip(tracks).set_duration(total).write_audiofile(
+            path, fps=AUDIO_FPS, codec="aac", logger=None
+        )
+        return True
+    finally:
+        pool.close()
+
+
+# ============================================================
+# 4️⃣ 이어 붙이기 (concat demuxer, 재인코딩 없음)
+# ============================================================
+def _run_ffmpeg(cmd: list, what: str) -> None:
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{what} 실패 (exit {result.returncode}):\n{result.stderr[-2000:]}")
+
+
+def concat_segments(
+    paths: list, output_path: str, workdir: str, total: float, fps: int, audio_path: str = None
+) -> None:
+    """
+    같은 설정으로 인코딩된 구간들을 -c copy로 이어 붙이고, 영상 길이가 total과 맞는지
+    (1프레임 이내) 확인한 뒤 오디오 트랙을 함께 mux
+    """
+    list_path = os.path.join(workdir, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    video_path = os.path.join(workdir, "video.mp4")
+    _run_ffmpeg(
+        [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+         "-c", "copy", video_path],
+        "구간 이어 붙이기",
+    )
+    duration = ffmpeg_render.probe(video_path)[1]
+    if duration is None:
+        print("⚠️ 이어 붙인 영상 길이를 확인하지 못했습니다. (ffprobe 없음)")
+    elif abs(duration - total) > 1.0 / fps + 1e-3:
+        raise RuntimeError(f"이어 붙인 영상 길이 불일치: {duration:.3f}s (예상 {total:.3f}s)")
+
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", "-i", video_path]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a"]
+    cmd += ["-c", "copy", "-movflags", "+faststart", output_path]
+    _run_ffmpeg(cmd, "오디오 합치기")
+
+
+# ============================================================
+# 5️⃣ 메인 함수
+# ============================================================
+def render_segmented(
+    renderable: list, output_path: str, resolution=(1080, 1920), fps=30, backend="moviepy",
+    progress=None, workers: int = SEGMENT_WORKERS, use_cache: bool = SEGMENT_CACHE_ENABLED
+) -> None:
+    """
+    컷 경계로 나눈 구간을 프로세스 풀에서 동시에 인코딩하고(영상만),
+    오디오는 전체 길이로 한 번 렌더링한 뒤 concat demuxer로 재인코딩 없이 합침.
+    use_cache=True면 입력이 바뀌지 않은 구간은 캐시된 파일을 그대로 이어 붙임
+    """
+    progress = progress or (lambda *args: None)
+    segments = split_segments(renderable, fps)
+    if not segments:
+        print("⚠️ 렌더링할 구간이 없습니다.")
+        return
+    total = segments[-1][1] / fps
+    settings = _render_settings(backend, resolution, fps)
+
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=".segments_", dir=out_dir) as workdir:
+        paths, keys, jobs = [], [], {}
+        for n, (n0, n1, items) in enumerate(segments):
+            key = segment_key(items, n1 - n0, settings) if use_cache else None
+            cached = _lookup_segment(key) if key else None
+            keys.append(key)
+            paths.append(cached or os.path.join(workdir, f"seg_{n:03d}.mp4"))
+            if not cached:
+                jobs[n] = (items, paths[n], resolution, fps, backend, n1 - n0)
+
+        workers = max(1, min(workers, len(jobs)))
+        threads = max(1, (os.cpu_count() or 2) // workers)
+        print(
+            f"🧩 {len(segments)}개 구간 중 {len(jobs)}개 렌더링, {len(segments) - len(jobs)}개 캐시 재사용 "
+            f"(프로세스 {workers}개, 구간당 스레드 {threads}개)"
+        )
+        audio_path = os.path.join(workdir, "audio.m4a")
+
+        done = total - sum(job[5] for job in jobs.values()) / fps
+        # 작업 프로세스 안에서도 풀을 만들 수 있도록 spawn 사용 (fork된 MoviePy 리더/스레드 상태를 물려받지 않음)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_render_segment, job + (threads,)): n for n, job in jobs.items()}
+            has_audio = _render_audio(renderable, audio_path, total)
+            for future in as_completed(futures):
+                future.result()
+                n = futures[future]
+                done += jobs[n][5] / fps
+                if keys[n]:
+                    paths[n] = _store_segment(keys[n], paths[n])
+                progress("render", min(95.0, 95 * done / total), f"구간 {done:.1f}/{total:.1f}s")
+
+        progress("render", 97, "구간 이어 붙이는 중")
+        concat_segments(paths, output_path, workdir, total, fps, audio_path if has_audio else None)
+
+    if use_cache:
+        _prune_segment_cache(keep=set(paths))
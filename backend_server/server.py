@@ -1,26 +1,53 @@
-from fastapi import FastAPI, UploadFile, Form
+from fastapi import FastAPI, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-import os, json, traceback
-from fastapi.responses import FileResponse, JSONResponse
+from contextlib import asynccontextmanager
+import os, json, time, shutil, asyncio, traceback
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 
-# 기존 모듈 가져오기
-from main import analyze_all_media, normalize_openai_analysis
-from local_langchain import run_pipeline
-from movie import render_shorts_from_timeline
+# 기존 모듈 가져오기 (분석/렌더링 모듈은 워커 프로세스에서 import)
+from workspace import WORKSPACE_ROOT, create_workspace, get_workspace, cleanup_workspaces
+from job_queue import JobStore, JobQueue, QUEUED, RUNNING, DONE, FAILED
+from upload_stream import UploadRejected, check_upload_request, receive_upload
+from progress import ProgressReporter
 
 # ---------------------------------
 # 기본 설정
 # ---------------------------------
-app = FastAPI(title="AI Reels Generator CapUp")
+job_store = JobStore()
+job_queue = None
+
+
+def cleanup_old_jobs() -> None:
+    """오래된 작업 공간을 지우고, 지운 작업의 상태 행/진행 이벤트도 함께 삭제 (대기/실행 중 작업은 보존)"""
+    removed = cleanup_workspaces(keep=tuple(job_store.ids_with_status(QUEUED, RUNNING)))
+    job_store.delete(removed)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_queue
+    job_queue = JobQueue(job_store)
+    job_queue.recover()
+    yield
+    job_queue.shutdown()
+
+
+app = FastAPI(title="AI Reels Generator CapUp", lifespan=lifespan)
 RESULT_DIR = "./results"
 
 
 MEDIA_DIR = "media"
 RESULT_DIR = "results"
+
+# 한 번의 업로드로 만들 수 있는 변형 영상 최대 개수 (langchain_story.VARIANT_HINTS 개수 이하)
+VARIANTS_MAX = int(os.getenv("VARIANTS_MAX", "5"))
 os.makedirs(MEDIA_DIR, exist_ok=True)
 os.makedirs(RESULT_DIR, exist_ok=True)
+os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+cleanup_old_jobs()
 
 # CORS (React 허용)
 app.add_middleware(
@@ -35,93 +62,281 @@ app.add_middleware(
 app.mount("/results", StaticFiles(directory=RESULT_DIR), name="results")
 
 
+# 작업 공간별 결과 (workspaces/<job_id>/results/final_shorts.mp4)
+# 작업 공간 전체를 mount하면 다른 사용자의 업로드 원본(media/)까지 노출되므로 results/ 파일만 서비스
+@app.get("/workspaces/{job_id}/results/{filename}")
+def serve_workspace_result(job_id: str, filename: str):
+    ws = get_workspace(job_id)
+    if ws is None or filename != os.path.basename(filename):
+        return JSONResponse({"error": "파일을 찾을 수 없습니다."}, status_code=404)
+    filepath = os.path.join(ws.result_dir, filename)
+    if not os.path.isfile(filepath):
+        return JSONResponse({"error": "파일을 찾을 수 없습니다."}, status_code=404)
+    return FileResponse(filepath)
+
+
 @app.get("/")
 def root():
     return {"message": "✅ FastAPI 서버 작동 중!", "media_dir": MEDIA_DIR, "result_dir": RESULT_DIR}
 
 
+# ---------------------------------
+# 업로드 폼 필드 변환 (본문을 직접 스트리밍 파싱하므로 Form(...) 대신 사용)
+# ---------------------------------
+def parse_upload_fields(fields: dict) -> dict:
+    try:
+        return {
+            "clipDuration": int(fields["clipDuration"]),
+            "aiPrompt": fields["aiPrompt"],
+            "mode": fields.get("mode") or "llm",
+            "variants": int(fields.get("variants") or 1),
+            "backend": fields.get("backend") or None,
+            "draft": (fields.get("draft") or "false").lower() in ("1", "true", "on", "yes"),
+        }
+    except KeyError as e:
+        raise UploadRejected(f"필수 입력값 누락: {e.args[0]}", 422)
+    except ValueError as e:
+        raise UploadRejected(f"입력값 형식 오류: {e}", 422)
+
+
 # ---------------------------------
 # 업로드 & LangChain 파이프라인 실행
 # ---------------------------------
 @app.post("/api/upload")
-async def upload_media(
-    files: list[UploadFile],
-    clipDuration: int = Form(...),
-    aiPrompt: str = Form(...)
-):
+async def upload_media(request: Request):
     """
-    1. 업로드된 영상/이미지 저장
-    2. OpenAI Vision 기반 분석
-    3. LangChain 파이프라인 실행
-    4. MoviePy 렌더링 후 결과 반환
+    1. 작업 공간(workspaces/<job_id>) 생성 후 업로드된 영상/이미지 저장
+       (multipart 본문을 받는 대로 파싱 → 형식/용량 초과는 전송 도중 바로 거절)
+    2. 작업 큐에 등록 후 job_id 즉시 반환
+       (Vision 분석 → LangChain → MoviePy 렌더링은 워커 프로세스에서 실행)
+    폼 필드: files(여러 개), clipDuration, aiPrompt,
+    mode: "llm"(기본) | "fast"(LLM 없이 규칙 기반 타임라인)
+    variants: 생성할 변형 영상 수 (1~VARIANTS_MAX, 분석/장면/스토리는 공유)
+    backend: 렌더링 백엔드 "moviepy" | "ffmpeg" (생략 시 RENDER_BACKEND)
+    draft: True면 저해상도 초안 + 컷 썸네일만 생성 → 확인 후 POST /api/jobs/{job_id}/render로 본 렌더링
     """
+    ws = None
+    # 본문을 직접 스트리밍으로 받으므로(UploadFile/Form 파라미터 없음) 이 핸들러는 헤더 도착 직후 실행됨
+    # → 여기서 잰 시각부터 본문 수신 완료까지가 실제 네트워크 업로드 시간 (ProgressReporter 기준 시각도 동일)
+    upload_started = time.time()
     try:
-        # 1️⃣ 파일 저장
-        saved_files = []
-        for file in files:
-            save_path = os.path.join(MEDIA_DIR, file.filename)
-            with open(save_path, "wb") as f:
-                f.write(await file.read())
-            saved_files.append(file.filename)
-
-        print(f"📂 업로드 완료: {saved_files}")
-
-        # 2️⃣ 미디어 분석
-        print("🧠 Step 1. OpenAI Vision 분석 중...")
-        analysis_results = analyze_all_media()  # media 폴더 전체 분석
-        print(f"✅ 분석 완료: {len(analysis_results)}개 항목")
-
-        # 3️⃣ LangChain 파이프라인 실행
-        print("🧩 Step 2. LangChain 파이프라인 실행...")
-        normalized = normalize_openai_analysis(analysis_results, aiPrompt)
-        result = run_pipeline(normalized, duration=clipDuration, user_prompt=aiPrompt)
-
-        # Pydantic to dict 변환
-        if hasattr(result.get("timeline"), "model_dump"):
-            result["timeline"] = result["timeline"].model_dump()
-
-        # 4️⃣ MoviePy 렌더링
-        print("🎬 Step 3. MoviePy 렌더링 시작...")
-        output_path = os.path.join(RESULT_DIR, "final_shorts.mp4")
-        render_shorts_from_timeline(result, output_path=output_path)
-
-        print(f"✅ 최종 영상 생성 완료 → {output_path}")
-
-        # 5️⃣ 결과 반환
+        # Content-Length 초과/multipart 아님은 본문을 받기 전에 거절
+        boundary = check_upload_request(request)
+
+        # SQLite/파일 정리는 블로킹 호출이므로 이벤트 루프 밖(스레드 풀)에서 실행
+        await run_in_threadpool(cleanup_old_jobs)
+        ws = await run_in_threadpool(create_workspace)
+
+        # 1️⃣ 파일 저장 (스트리밍 파싱, 청크 단위 기록, 파일별/요청별 용량 제한)
+        fields, uploads = await receive_upload(request, boundary, ws.media_dir)
+        upload_sec = round(time.time() - upload_started, 3)
+        form = parse_upload_fields(fields)
+        clipDuration, aiPrompt = form["clipDuration"], form["aiPrompt"]
+        mode, variants, backend, draft = form["mode"], form["variants"], form["backend"], form["draft"]
+        if not uploads:
+            raise UploadRejected("업로드된 파일이 없습니다.", 400)
+        if mode not in ("llm", "fast"):
+            raise UploadRejected(f"지원하지 않는 mode: {mode}", 400)
+        if backend not in (None, "moviepy", "ffmpeg"):
+            raise UploadRejected(f"지원하지 않는 backend: {backend}", 400)
+        if not 1 <= variants <= VARIANTS_MAX:
+            raise UploadRejected(f"variants는 1~{VARIANTS_MAX} 사이여야 합니다.", 400)
+        if draft and variants > 1:
+            raise UploadRejected("draft는 variants=1일 때만 사용할 수 있습니다.", 400)
+
+        saved_files = [name for name, _, _ in uploads]
+        file_hashes = {name: digest for name, _, digest in uploads}
+        total = sum(size for _, size, _ in uploads)
+
+        print(f"📂 업로드 완료 [{ws.job_id}]: {saved_files} ({total / (1024 * 1024):.1f}MB)")
+
+        # 2️⃣ 작업 등록 (업로드 소요 시간은 워커가 결과 timings에 합침)
+        await run_in_threadpool(job_store.create, ws.job_id, {
+            "duration": clipDuration,
+            "user_prompt": aiPrompt,
+            "files": saved_files,
+            "file_hashes": file_hashes,
+            "mode": mode,
+            "variants": variants,
+            "backend": backend,
+            "draft": draft,
+            "upload_sec": upload_sec,
+        })
+        await run_in_threadpool(
+            ProgressReporter(ws.job_id, job_store, started=upload_started),
+            "upload", 100, f"{len(saved_files)}개 파일 업로드 완료"
+        )
+        # 워커 풀 재생성 후에도 제출에 실패하면 작업은 실패 처리됨 (SQLite 기록 → 스레드 풀)
+        if not await run_in_threadpool(job_queue.submit, ws.job_id):
+            return JSONResponse({"error": "작업을 등록하지 못했습니다.", "job_id": ws.job_id}, status_code=503)
+
         return {
-            "message": "✅ 영상 생성 완료!",
-            "result_path": f"/results/final_shorts.mp4",
+            "message": "⏳ 작업이 등록되었습니다.",
+            "job_id": ws.job_id,
+            "status": QUEUED,
+            "status_url": f"/api/jobs/{ws.job_id}",
+            "events_url": f"/api/jobs/{ws.job_id}/events",
+            "result_url": f"/api/jobs/{ws.job_id}/result",
             "files": saved_files,
         }
 
+    except UploadRejected as e:
+        if ws is not None:
+            await run_in_threadpool(shutil.rmtree, ws.dir, ignore_errors=True)
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
     except Exception as e:
         print("❌ 오류 발생:", traceback.format_exc())
         return {"error": str(e), "trace": traceback.format_exc()}
 
 
+# ---------------------------------
+# 작업 상태 / 결과 조회
+# (job_store는 블로킹 SQLite 호출 → 일반 def 엔드포인트로 두어 FastAPI 스레드 풀에서 실행)
+# ---------------------------------
+@app.get("/api/jobs/{job_id}")
+def get_job_status(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "작업을 찾을 수 없습니다."}, status_code=404)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "error": job["error"].splitlines()[0] if job["error"] else None,
+        "progress": job_store.latest_event(job_id),
+    }
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, last_event_id: int = 0):
+    """
+    작업 진행 이벤트를 SSE(text/event-stream)로 전송.
+    각 이벤트: stage, percent, overall_percent, elapsed, eta, stage_elapsed, stage_eta, message
+    작업이 끝나면 마지막에 event: end (status, timings) 전송.
+    Last-Event-ID 헤더 또는 last_event_id 쿼리로 이어받기 가능 (본 렌더링 요청 응답의 events_url에 포함).
+    """
+    if await run_in_threadpool(job_store.get, job_id) is None:
+        return JSONResponse({"error": "작업을 찾을 수 없습니다."}, status_code=404)
+
+    try:
+        last_id = int(request.headers.get("last-event-id", last_event_id))
+    except ValueError:
+        last_id = 0
+
+    async def event_stream():
+        nonlocal last_id
+        while not await request.is_disconnected():
+            job = await run_in_threadpool(job_store.get, job_id)
+            if job is None:   # 스트리밍 중 작업 공간과 함께 정리된 경우
+                break
+            events = await run_in_threadpool(job_store.events_since, job_id, last_id)
+            for event in events:
+                last_id = event["id"]
+                yield f"id: {last_id}\nevent: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if job["status"] in (DONE, FAILED):
+                end = {"status": job["status"], "timings": (job["result"] or {}).get("timings")}
+                yield f"event: end\ndata: {json.dumps(end, ensure_ascii=False)}\n\n"
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "작업을 찾을 수 없습니다."}, status_code=404)
+    if job["status"] == FAILED:
+        return JSONResponse({"job_id": job_id, "status": FAILED, "error": job["error"]}, status_code=500)
+    if job["status"] != DONE:
+        return JSONResponse({"job_id": job_id, "status": job["status"]}, status_code=202)
+    return job["result"]
+
+
+@app.post("/api/jobs/{job_id}/render")
+def render_approved_draft(job_id: str, backend: str = Form(None)):
+    """
+    초안(draft) 작업을 확인한 뒤 같은 타임라인으로 최종 해상도 렌더링을 요청.
+    분석/LLM은 다시 실행하지 않으며, 같은 job_id로 진행 상황/결과를 조회합니다.
+    본 렌더링이 실패한 작업도 다시 요청할 수 있습니다. 초안 단계 이벤트는 last_event_id 이후로 건너뜀
+    """
+    job = job_store.get(job_id)
+    ws = get_workspace(job_id)
+    if job is None or ws is None:
+        return JSONResponse({"error": "작업을 찾을 수 없습니다."}, status_code=404)
+    draft_done = job["status"] == DONE and (job["result"] or {}).get("draft") and not job["params"].get("approved")
+    retry = job["status"] == FAILED and job["params"].get("approved")
+    if not (draft_done or retry):
+        return JSONResponse({"error": "완료된 초안 작업만 본 렌더링할 수 있습니다.", "status": job["status"]}, status_code=409)
+    if not os.path.exists(ws.render_timeline_path):
+        return JSONResponse({"error": "저장된 타임라인이 없습니다."}, status_code=409)
+    if backend not in (None, "moviepy", "ffmpeg"):
+        return JSONResponse({"error": f"지원하지 않는 backend: {backend}"}, status_code=400)
+
+    params = dict(job["params"], draft=False, approved=True, queued_at=time.time())
+    if backend:
+        params["backend"] = backend
+    # 초안 단계 이벤트(render 100 등)를 다시 받지 않도록 이 이후 이벤트만 보게 함
+    last_event = job_store.latest_event(job_id)
+    last_event_id = last_event["id"] if last_event else 0
+    # 확인~대기열 등록 사이에 다른 요청이 먼저 등록했으면 (조건부 UPDATE 실패) 중복 렌더링하지 않음
+    if not job_store.requeue(job_id, params, job["status"], job["finished"]):
+        return JSONResponse({"error": "이미 본 렌더링이 요청된 작업입니다."}, status_code=409)
+    ProgressReporter(job_id, job_store, started=params["queued_at"])("render", 0, "본 렌더링 대기 중")
+    if not job_queue.submit(job_id):
+        return JSONResponse({"error": "본 렌더링을 등록하지 못했습니다.", "job_id": job_id}, status_code=503)
+
+    return {
+        "message": "⏳ 본 렌더링이 등록되었습니다.",
+        "job_id": job_id,
+        "status": QUEUED,
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events?last_event_id={last_event_id}",
+        "result_url": f"/api/jobs/{job_id}/result",
+        "last_event_id": last_event_id,
+    }
+
+
 @app.get("/api/export")
-async def download_latest_video():
+def download_latest_video(job_id: str = None, variant: int = None, draft: bool = False):
     """
-    results 폴더에서 가장 최근 생성된 MP4 파일을 찾아서 자동 다운로드
+    job_id가 있으면 해당 작업의 결과 영상 (기본: 본 렌더링 final_shorts,
+    variant=n이면 n번 변형, draft=true면 초안 영상 — Workspace 경로로 직접 지정),
+    없으면 main.py 단독 실행용 results 폴더에서 가장 최근 생성된 MP4 파일을 찾아서 자동 다운로드
+    (다른 사용자의 작업 결과는 job_id 없이 내려주지 않음).
+    파일 목록/수정시각 조회는 블로킹 호출 → 일반 def로 두어 FastAPI 스레드 풀에서 실행
     """
     try:
-        if not os.path.exists(RESULT_DIR):
-            return JSONResponse({"error": "결과 폴더가 없습니다."}, status_code=404)
+        if job_id:
+            ws = get_workspace(job_id)
+            if ws is None:
+                return JSONResponse({"error": "해당 작업의 결과 영상이 없습니다."}, status_code=404)
+            if draft:
+                filepath = ws.draft_output_path
+            elif variant is not None:
+                filepath = ws.variant_output_path(variant)
+            else:
+                filepath = ws.output_path
+            if not os.path.exists(filepath):
+                return JSONResponse({"error": "해당 작업의 결과 영상이 없습니다."}, status_code=404)
+            print(f"🎬 작업 결과 다운로드 요청 [{job_id}]: {os.path.basename(filepath)}")
+            return FileResponse(filepath, media_type="video/mp4", filename=os.path.basename(filepath))
 
         mp4_files = [
-            f for f in os.listdir(RESULT_DIR)
+            os.path.join(RESULT_DIR, f)
+            for f in os.listdir(RESULT_DIR)
             if f.lower().endswith(".mp4")
         ]
         if not mp4_files:
             return JSONResponse({"error": "저장된 mp4 파일이 없습니다."}, status_code=404)
 
         # 수정시간(최근순)으로 정렬
-        mp4_files.sort(
-            key=lambda f: os.path.getmtime(os.path.join(RESULT_DIR, f)),
-            reverse=True
-        )
-        latest_file = mp4_files[0]
-        filepath = os.path.join(RESULT_DIR, latest_file)
+        mp4_files.sort(key=os.path.getmtime, reverse=True)
+        filepath = mp4_files[0]
+        latest_file = os.path.basename(filepath)
 
         print(f"🎬 최신 파일 다운로드 요청: {latest_file}")
         return FileResponse(
@@ -0,0 +1,186 @@
+import os, glob, subprocess
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from disk_cache import make_cache_key
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+# 비어 있으면 fontconfig(fc-list)로 한글 폰트 검색
+SUBTITLE_FONT = os.getenv("SUBTITLE_FONT", "")
+SUBTITLE_CACHE_DIR = os.path.join(os.getenv("CACHE_DIR", "cache"), "subtitles")
+SUBTITLE_CACHE_MAX_FILES = int(os.getenv("SUBTITLE_CACHE_MAX_FILES", "2000"))
+
+# 기존 TextClip 설정과 같은 기본 스타일
+FONT_SIZE = 60
+TEXT_COLOR = "white"
+STROKE_COLOR = "black"
+STROKE_WIDTH = 2
+LINE_SPACING = 1.2
+# 위 스타일의 기준 가로 해상도 (다른 해상도에서는 비율대로 축소/확대)
+BASE_WIDTH = 1080
+
+# fontconfig에 한글 폰트가 없거나 쓸 수 없을 때(Windows 등) 확인할 한글 폰트 후보
+FONT_CANDIDATES = [
+    "C:/Windows/Fonts/malgun.ttf",
+    "/usr/share/fonts/truetype/nanum/NanumGothic.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/System/Library/Fonts/AppleSDGothicNeo.ttc",
+]
+
+_MEMORY_CACHE_SIZE = 256
+_memory_cache = OrderedDict()   # cache key → RGBA ndarray
+
+
+# ============================================================
+# 1️⃣ 폰트 찾기 (fontconfig → 후보 경로)
+# ============================================================
+@lru_cache(maxsize=1)
+def find_font() -> str:
+    """
+    SUBTITLE_FONT → fc-list ':lang=ko' → 알려진 경로 순으로 한글 폰트 파일 검색.
+    fc-match는 한글 폰트가 없어도 가장 가까운 폰트를 돌려주므로(한글이 □로 출력됨)
+    한글을 지원하는 폰트만 나열하는 fc-list를 사용
+    """
+    if SUBTITLE_FONT:
+        return SUBTITLE_FONT
+    try:
+        out = subprocess.run(
+            ["fc-list", ":lang=ko", "file"], capture_output=True, text=True, timeout=10
+        )
+        if out.returncode == 0:
+            # 출력 형식: "/path/to/font.ttc: " (한 줄에 하나)
+            found = sorted(line.split(":")[0].strip() for line in out.stdout.splitlines() if line.strip())
+            found = [path for path in found if os.path.exists(path)]
+            if found:
+                return found[0]
+    except (OSError, subprocess.SubprocessError):
+        pass
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    found = glob.glob("/usr/share/fonts/**/*CJK*", recursive=True) + glob.glob("/usr/share/fonts/**/Nanum*", recursive=True)
+    if found:
+        return sorted(found)[0]
+    print("⚠️ 한글 폰트를 찾지 못했습니다. 기본 폰트로는 한글 자막이 □로 표시됩니다. SUBTITLE_FONT 환경 변수를 지정하세요.")
+    return ""
+
+
+@lru_cache(maxsize=16)
+def _load_font(path: str, size: int):
+    if not path:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(path, size)
+
+
+# ============================================================
+# 2️⃣ 래스터화 (줄바꿈 + 외곽선)
+# ============================================================
+def wrap_lines(text: str, font, max_width: int) -> list:
+    """단어 단위로 max_width(px)에 맞춰 줄바꿈, 한 단어가 너무 길면 글자 단위로 나눔"""
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if font.getlength(candidate) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            line = ""
+            for ch in word:
+                if line and font.getlength(line + ch) > max_width:
+                    lines.append(line)
+                    line = ""
+                line += ch
+        lines.append(line)
+    return lines
+
+
+def rasterize(
+    text: str, width: int, font_size: int = FONT_SIZE, color: str = TEXT_COLOR,
+    stroke_color: str = STROKE_COLOR, stroke_width: int = STROKE_WIDTH, font_path: str = None
+) -> Image.Image:
+    """가로 width(px) 투명 캔버스에 가운데 정렬 자막을 그린 RGBA 이미지"""
+    font = _load_font(font_path if font_path is not None else find_font(), font_size)
+    margin = stroke_width * 2
+    lines = wrap_lines(text, font, width - margin * 2)
+    line_height = int(font_size * LINE_SPACING)
+    height = line_height * len(lines) + margin * 2
+
+    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for n, line in enumerate(lines):
+        draw.text(
+            (width / 2, margin + n * line_height), line, font=font, fill=color, anchor="ma",
+            stroke_width=stroke_width, stroke_fill=stroke_color,
+        )
+    return img
+
+
+# ============================================================
+# 3️⃣ 캐시 (메모리 LRU + 디스크 PNG)
+# ============================================================
+def style_for_width(width: int) -> dict:
+    """출력 가로 해상도에 맞춘 글자 크기/외곽선 두께 (1080px에서 기본 스타일과 같음)"""
+    scale = width / BASE_WIDTH
+    return {"font_size": max(8, round(FONT_SIZE * scale)), "stroke_width": max(1, round(STROKE_WIDTH * scale))}
+
+
+def _cache_key(text: str, width: int, font_size: int, color: str, stroke_color: str, stroke_width: int) -> str:
+    return make_cache_key("subtitle", text, width, font_size, color, stroke_color, stroke_width, find_font())
+
+
+def _prune_disk_cache() -> None:
+    """PNG 개수가 한도를 넘으면 오래 사용하지 않은(mtime) 것부터 삭제"""
+    files = glob.glob(os.path.join(SUBTITLE_CACHE_DIR, "*.png"))
+    if len(files) <= SUBTITLE_CACHE_MAX_FILES:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[:len(files) - SUBTITLE_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def subtitle_png(
+    text: str, width: int = 1080, font_size: int = FONT_SIZE, color: str = TEXT_COLOR,
+    stroke_color: str = STROKE_COLOR, stroke_width: int = STROKE_WIDTH
+) -> str:
+    """자막 PNG 경로 반환 (같은 텍스트/스타일/크기는 디스크 캐시 재사용, ffmpeg 백엔드 overlay용)"""
+    key = _cache_key(text, width, font_size, color, stroke_color, stroke_width)
+    path = os.path.join(SUBTITLE_CACHE_DIR, f"{key}.png")
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    os.makedirs(SUBTITLE_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    rasterize(text, width, font_size, color, stroke_color, stroke_width).save(tmp_path, format="PNG")
+    os.replace(tmp_path, path)
+    _prune_disk_cache()
+    return path
+
+
+def subtitle_rgba(
+    text: str, width: int = 1080, font_size: int = FONT_SIZE, color: str = TEXT_COLOR,
+    stroke_color: str = STROKE_COLOR, stroke_width: int = STROKE_WIDTH
+) -> np.ndarray:
+    """자막 RGBA 배열 (H, W, 4) — 메모리 LRU → 디스크 PNG 순으로 재사용 (MoviePy 백엔드용)"""
+    key = _cache_key(text, width, font_size, color, stroke_color, stroke_width)
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    path = subtitle_png(text, width, font_size, color, stroke_color, stroke_width)
+    with Image.open(path) as img:
+        arr = np.asarray(img.convert("RGBA"))
+    _memory_cache[key] = arr
+    if len(_memory_cache) > _MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return arr
@@ -0,0 +1,274 @@
+import os, math
+from bisect import bisect_right
+from schemas import TimelineItem, TimelineOutput
+
+# ============================================================
+# 0️⃣ 설정
+# ============================================================
+MIN_CUT_SEC = 3.0
+MAX_CUT_SEC = 7.0
+HOOK_SEC = 3.0
+MIN_SUBTITLE_SEC = 0.5
+VISUAL_TYPES = ("video", "image")
+TYPE_ORDER = {"video": 0, "image": 0, "subtitle": 1, "audio": 2}
+
+
+# ============================================================
+# 1️⃣ Helper Functions
+# ============================================================
+def _known_files(analysis_json: dict) -> set:
+    return {
+        item.get("filename")
+        for key in ("videos", "images", "audio")
+        for item in analysis_json.get(key, [])
+        if item.get("filename")
+    }
+
+
+def _descriptions(analysis_json: dict) -> dict:
+    """filename → 분석 설명 (타임라인의 video/image 항목에는 text가 거의 없어 자막은 여기서 만듦)"""
+    return {
+        item["filename"]: item.get("description") or ""
+        for key in ("videos", "images")
+        for item in analysis_json.get(key, [])
+        if item.get("filename")
+    }
+
+
+def _file_ok(filename: str, known: set, media_dir: str = None) -> bool:
+    if not filename:
+        return False
+    if filename in known:
+        return True
+    return bool(media_dir) and os.path.exists(os.path.join(media_dir, filename))
+
+
+def _best_visual(starts: list, visuals: list, start: float, end: float) -> int:
+    """정렬된 visual 구간 중 [start, end)와 가장 많이 겹치는(없으면 가장 가까운) 인덱스 (이진 탐색)"""
+    i = bisect_right(starts, start) - 1
+    candidates = [j for j in (i - 1, i, i + 1, i + 2) if 0 <= j < len(visuals)]
+
+    def overlap(j):
+        _, s, e = visuals[j]
+        return min(end, e) - max(start, s)
+
+    def distance(j):
+        _, s, e = visuals[j]
+        return abs((s + e) / 2 - (start + end) / 2)
+
+    best = max(candidates, key=lambda j: (overlap(j), -distance(j)))
+    return best
+
+
+def _fit_lengths(lengths: list, total: float) -> tuple:
+    """
+    합이 total이 되도록 각 컷 길이를 MIN_CUT_SEC~MAX_CUT_SEC 안에서 남은 여유에 비례해 늘리거나 줄임
+    → (새 길이 리스트, 범위 안에서 맞추지 못한 나머지(초, +면 빈 구간))
+    """
+    diff = total - sum(lengths)
+    if abs(diff) < 1e-6:
+        return lengths, 0.0
+    sign = 1.0 if diff > 0 else -1.0
+    room = [MAX_CUT_SEC - l if sign > 0 else l - MIN_CUT_SEC for l in lengths]
+    total_room = sum(r for r in room if r > 0)
+    if total_room <= 0:
+        return lengths, diff
+    used = min(abs(diff), total_room)
+    fitted = [l + sign * used * max(r, 0.0) / total_room for l, r in zip(lengths, room)]
+    return fitted, diff - sign * used
+
+
+# ============================================================
+# 2️⃣ 타임라인 정규화 / 보정
+# ============================================================
+def normalize_timeline(tl, analysis_json: dict, duration: int, hook_line: str = None, media_dir: str = None):
+    """
+    LLM 타임라인을 렌더링 가능한 형태로 보정하고 (TimelineOutput, report) 반환.
+    트랙별로 start 기준 정렬(O(n log n)) 후:
+    1) 타입이 잘못됐거나 분석 결과/미디어 폴더에 없는 파일을 참조하는 항목 제거
+    2) video/image 트랙: 각 컷을 3~7초로 맞추고, 3~7초 안에서 전체 길이를 채울 수 있게 컷 수를 맞춘 뒤
+       (모자라면 앞 컷부터 반복 — 영상은 다음 구간부터, 넘치면 뒤 컷 제거) 남는 길이를 3~7초 안에서 나눠
+       겹침/빈 구간 없이 이어 붙임. 그래도 맞지 않는 길이는 늘이지 않고 report["gap"]으로 남김.
+       같은 이미지가 연달아 반복되면 한 컷으로 합침 (컷마다 페이드인으로 화면이 깜빡이지 않게)
+    3) subtitle: 가장 많이 겹치던 컷에 짝지어 같은 상대 위치로 옮기고, 자막이 없는 컷(반복 컷 포함)에는
+       분석 결과의 파일 설명으로 추가
+    4) hook_line 자막을 첫 3초에 배치 (밀려난 자막은 원래 길이만큼 컷 안에서 연장, 그래도 짧으면 제거),
+       자막끼리 겹치는 구간 정리
+    5) audio: 1개만 남기고 전체 길이에 배치 (없으면 분석 결과의 첫 오디오 추가)
+    """
+    # local_planner → langchain_story가 이 모듈을 import하므로 순환 import를 피하기 위해 함수 안에서 import
+    from local_planner import subtitle_from_description
+
+    total = float(duration)
+    known = _known_files(analysis_json)
+    report = {
+        "input_items": len(tl.timeline), "dropped_missing": [], "dropped_invalid": 0,
+        "overlaps_fixed": 0, "gaps_filled": 0, "clamped": 0, "repeated": 0, "trimmed": 0, "gap": 0.0,
+        "repeats_merged": 0,
+        "subtitles_moved": 0, "subtitles_added": 0, "subtitle_overlaps_fixed": 0,
+        "hook_placed": False, "audio": None,
+    }
+
+    # 1) 트랙 분리 + 유효성 검사
+    visuals, subtitles, audios = [], [], []
+    for item in tl.timeline:
+        t = str(item.type or "").strip().lower()
+        try:
+            start, end = max(0.0, float(item.start)), float(item.end)
+        except (TypeError, ValueError):
+            report["dropped_invalid"] += 1
+            continue
+        if t not in TYPE_ORDER:
+            report["dropped_invalid"] += 1
+            continue
+        if t != "subtitle" and not _file_ok(item.filename, known, media_dir):
+            report["dropped_missing"].append(item.filename)
+            continue
+        if t == "subtitle" and (not (item.text or "").strip() or end - start < MIN_SUBTITLE_SEC):
+            report["dropped_invalid"] += 1
+            continue
+        if end <= start:
+            end = start + MIN_CUT_SEC
+        {"subtitle": subtitles, "audio": audios}.get(t, visuals).append((item, start, end, t))
+
+    # 2) video/image 트랙: 정렬 → 3~7초 보정 → 컷 수 맞추기(반복/제거) → 3~7초 안에서 길이 분배 → 이어 붙이기
+    visuals.sort(key=lambda v: (v[1], v[2]))
+    prev_end = 0.0
+    lengths = []
+    for _, start, end, _ in visuals:
+        if start < prev_end - 1e-3:
+            report["overlaps_fixed"] += 1
+        elif start > prev_end + 1e-3:
+            report["gaps_filled"] += 1
+        prev_end = max(prev_end, end)
+        length = min(max(end - start, MIN_CUT_SEC), MAX_CUT_SEC)
+        if abs(length - (end - start)) > 1e-3:
+            report["clamped"] += 1
+        lengths.append(length)
+
+    # 컷 수: total을 3~7초 컷으로 채울 수 있는 범위 [ceil(total/7), floor(total/3)] 안으로
+    cuts = [(item, t, start, end) for item, start, end, t in visuals]
+    if cuts and total < MIN_CUT_SEC:
+        report["trimmed"] = len(cuts) - 1
+        cuts, lengths = cuts[:1], [total]
+    elif cuts:
+        max_count = int(total // MIN_CUT_SEC + 1e-9)
+        min_count = math.ceil(total / MAX_CUT_SEC - 1e-9)
+        if len(cuts) > max_count:
+            report["trimmed"] = len(cuts) - max_count
+            cuts, lengths = cuts[:max_count], lengths[:max_count]
+        originals = list(zip(cuts, lengths))
+        for k in range(min_count - len(cuts)):
+            (item, t, _, _), length = originals[k % len(originals)]
+            if t == "video":
+                # 같은 영상은 이어지는 구간을 사용 (원본 길이를 넘으면 렌더러가 보정)
+                offset = (item.source_start or 0.0) + length * (k // len(originals) + 1)
+                item = item.model_copy(update={"source_start": round(offset, 3)})
+            cuts.append((item, t, None, None))
+            lengths.append(length)
+        report["repeated"] = max(0, min_count - len(originals))
+        lengths, gap = _fit_lengths(lengths, total)
+        report["gap"] = round(gap, 3)
+
+    placed, cursor = [], 0.0
+    for (item, t, start, end), length in zip(cuts, lengths):
+        new_start, new_end = cursor, cursor + length
+        cursor = new_end
+        placed.append((item, t, start, end, round(new_start, 3), round(new_end, 3)))
+    if placed and abs(report["gap"]) < 1e-3:
+        placed[-1] = placed[-1][:5] + (round(total, 3),)
+
+    # 3) 자막 ↔ 컷 짝짓기 (원래 구간 기준으로 가장 많이 겹치는 컷의 새 구간으로 이동, 반복 컷은 짝짓기 제외)
+    orig = [(n, p[2], p[3]) for n, p in enumerate(placed) if p[2] is not None]
+    starts = [s for _, s, _ in orig]
+    new_subs, paired = [], set()
+    for item, start, end, _ in sorted(subtitles, key=lambda s: (s[1], s[2])):
+        if not placed:
+            new_subs.append([item.text, min(start, total), min(end, total), total])
+            continue
+        j = orig[_best_visual(starts, orig, start, end)][0]
+        paired.add(j)
+        _, _, vs, ve, ns, ne = placed[j]
+        span = (ve - vs) or 1.0
+        fs = min(max((start - vs) / span, 0.0), 1.0)
+        fe = min(max((end - vs) / span, 0.0), 1.0)
+        s_new, e_new = ns + fs * (ne - ns), ns + fe * (ne - ns)
+        if e_new - s_new < MIN_SUBTITLE_SEC:
+            s_new, e_new = ns, ne
+        if abs(s_new - start) > 1e-3 or abs(e_new - end) > 1e-3:
+            report["subtitles_moved"] += 1
+        new_subs.append([item.text, round(s_new, 3), round(e_new, 3), ne])
+
+    descriptions = _descriptions(analysis_json)
+    for n, (item, t, _, _, ns, ne) in enumerate(placed):
+        if n not in paired:
+            text = subtitle_from_description(item.text or descriptions.get(item.filename, ""))
+            if text:
+                new_subs.append([text, ns, ne, ne])
+                report["subtitles_added"] += 1
+
+    # 4) 후킹 자막을 첫 3초에 배치 + 자막 트랙 겹침 정리 (자막 항목: [text, start, end, 짝지은 컷의 끝])
+    if hook_line and hook_line.strip():
+        hook = hook_line.strip()
+        hook_end = round(min(HOOK_SEC, total, placed[0][5] if placed else HOOK_SEC), 3)
+        new_subs = [s for s in new_subs if (s[0] or "").strip() != hook]
+        for s in new_subs:
+            if s[1] < hook_end:
+                length = s[2] - s[1]
+                s[1] = hook_end
+                s[2] = round(max(s[2], min(s[3], hook_end + length)), 3)
+        new_subs = [s for s in new_subs if s[2] - s[1] >= MIN_SUBTITLE_SEC]
+        new_subs.append([hook, 0.0, hook_end, hook_end])
+        report["hook_placed"] = True
+
+    new_subs.sort(key=lambda s: (s[1], s[2]))
+    cleaned = []
+    for sub in new_subs:
+        if cleaned and sub[0] == cleaned[-1][0] and sub[1] <= cleaned[-1][2] + 1e-3:
+            # 반복 컷에 이어지는 같은 설명 자막은 하나로
+            cleaned[-1][2] = max(cleaned[-1][2], sub[2])
+            continue
+        if cleaned and sub[1] < cleaned[-1][2] - 1e-3:
+            report["subtitle_overlaps_fixed"] += 1
+            cleaned[-1][2] = sub[1]
+            if cleaned[-1][2] - cleaned[-1][1] < MIN_SUBTITLE_SEC:
+                cleaned.pop()
+        cleaned.append(sub)
+
+    # 5) 오디오 1개만 전체 길이로
+    audios.sort(key=lambda a: a[1])
+    audio_file = audios[0][0].filename if audios else None
+    audio_in = audios[0][0].source_start if audios else None
+    if audio_file is None and analysis_json.get("audio"):
+        audio_file = analysis_json["audio"][0]["filename"]
+    report["audio"] = audio_file
+
+    # 같은 정지 이미지가 연달아 반복된 컷은 하나로 합침 (자막 짝짓기는 합치기 전 컷 기준)
+    merged = []
+    for p in placed:
+        prev = merged[-1] if merged else None
+        if prev and p[2] is None and p[1] == prev[1] == "image" and p[0].filename == prev[0].filename:
+            merged[-1] = prev[:5] + (p[5],)
+            report["repeats_merged"] += 1
+        else:
+            merged.append(p)
+    placed = merged
+
+    timeline = [
+        TimelineItem(type=t, filename=item.filename, text=item.text, start=ns, end=ne, source_start=item.source_start)
+        for item, t, _, _, ns, ne in placed
+    ]
+    timeline += [TimelineItem(type="subtitle", text=text, start=s, end=e) for text, s, e, _ in cleaned]
+    if audio_file:
+        timeline.append(TimelineItem(type="audio", filename=audio_file, start=0.0, end=total, source_start=audio_in))
+    timeline.sort(key=lambda i: (i.start, TYPE_ORDER[i.type]))
+
+    report["output_items"] = len(timeline)
+    print(
+        f"🛠️ 타임라인 보정: {report['input_items']} → {report['output_items']}개 "
+        f"(누락 파일 {len(report['dropped_missing'])}, 겹침 {report['overlaps_fixed']}, "
+        f"빈 구간 {report['gaps_filled']}, 길이 보정 {report['clamped']}, "
+        f"반복 {report['repeated']}(합침 {report['repeats_merged']})/제거 {report['trimmed']}, 남은 길이 {report['gap']}s, "
+        f"자막 이동 {report['subtitles_moved']}/추가 {report['subtitles_added']})"
+    )
+    return TimelineOutput(story_summary=tl.story_summary, timeline=timeline), report
@@ -0,0 +1,110 @@
+import os, json
+from llm_cache import LLM_CACHE_ENABLED, chain_cache_key, llm_cache, lookup_cached
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+# true면 타임라인 단계를 토큰 스트리밍으로 실행하고 완성된 항목부터 콜백으로 전달
+TIMELINE_STREAM = os.getenv("TIMELINE_STREAM", "true").lower() == "true"
+
+
+# ============================================================
+# 1️⃣ 증분 JSON 파서 (timeline 배열의 항목 단위)
+# ============================================================
+class TimelineItemParser:
+    """
+    {"story_summary": "...", "timeline": [{...}, {...}]} 형태의 JSON이 조각으로 들어올 때
+    timeline 배열 안의 객체가 닫히는 즉시 dict로 반환.
+    문자열/이스케이프 상태를 추적하므로 자막 안의 괄호나 따옴표는 구조로 보지 않음
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None     # 최상위 객체에서 마지막으로 닫힌 문자열 (키 판별용)
+        self.array_depth = None     # timeline 배열 안쪽 깊이
+        self.item_start = None
+        self.count = 0
+
+    def feed(self, text: str) -> list:
+        self.buf += text
+        items = []
+        buf = self.buf
+        for i in range(self.pos, len(buf)):
+            ch = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.string_start is not None:
+                        self.last_string = buf[self.string_start:i]
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_start = i + 1
+            elif ch in "{[":
+                if ch == "[" and self.depth == 1 and self.last_string == "timeline" and self.array_depth is None:
+                    self.array_depth = self.depth + 1
+                elif ch == "{" and self.array_depth is not None and self.depth == self.array_depth:
+                    self.item_start = i
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if ch == "}" and self.item_start is not None and self.depth == self.array_depth:
+                    try:
+                        items.append(json.loads(buf[self.item_start:i + 1]))
+                        self.count += 1
+                    except json.JSONDecodeError:
+                        pass
+                    self.item_start = None
+                elif ch == "]" and self.array_depth is not None and self.depth == self.array_depth - 1:
+                    self.array_depth = -1   # 배열 종료 (이후 항목 없음)
+        self.pos = len(buf)
+        return items
+
+
+# ============================================================
+# 2️⃣ 스트리밍 실행 (캐시 공유)
+# ============================================================
+async def astream_structured(name: str, prompt, base_llm, schema, inputs: dict, on_item=None):
+    """
+    prompt | base_llm(JSON 모드)을 astream으로 실행하면서
+    timeline 항목이 완성될 때마다 on_item(dict) 호출, 끝나면 schema로 검증해 반환.
+    엄격한 구조화 출력(cached_chain) 캐시를 먼저 보고, 없으면 JSON 모드 전용 키를 확인.
+    JSON 모드 결과는 전용 키에만 저장하므로 cached_chain 쪽에서는 쓰이지 않습니다.
+    히트 시 저장된 항목을 바로 전달합니다.
+    """
+    on_item = on_item or (lambda item: None)
+    hit = lookup_cached(name, chain_cache_key(prompt, schema, base_llm)(inputs), schema)
+    key = chain_cache_key(prompt, schema, base_llm, mode="json_object")(inputs)
+    if hit is None:
+        hit = lookup_cached(name, key, schema)
+    if hit is not None:
+        for item in hit.timeline:
+            on_item(item.model_dump())
+        return hit
+
+    chain = prompt | base_llm.bind(response_format={"type": "json_object"})
+    parser = TimelineItemParser()
+    chunks = []
+    async for chunk in chain.astream(inputs):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if not text:
+            continue
+        chunks.append(text)
+        for item in parser.feed(text):
+            on_item(item)
+
+    out = schema.model_validate_json("".join(chunks))
+    print(f"📡 타임라인 스트리밍 완료: 항목 {parser.count}개 수신")
+    if LLM_CACHE_ENABLED:
+        llm_cache.set(key, out.model_dump())
+    return out
@@ -0,0 +1,192 @@
+import os, hashlib
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from starlette.concurrency import run_in_threadpool
+from file_utils import check_file_type
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_MB", "1024")) * 1024 * 1024
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_MB", "4096")) * 1024 * 1024
+# 파일이 아닌 폼 필드(aiPrompt 등) 1개 최대 크기
+UPLOAD_MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _mb(n: int) -> int:
+    return n // (1024 * 1024)
+
+
+def _write_chunk(f, h, data: bytes) -> None:
+    h.update(data)
+    f.write(data)
+
+
+# ============================================================
+# 1️⃣ multipart/form-data 스트리밍 수신
+# ============================================================
+class _UploadReceiver:
+    """
+    MultipartParser 콜백이 쌓은 이벤트를 받아 파일 파트는 디스크로, 나머지는 폼 필드로 처리.
+    파일 형식/용량은 바이트가 도착하는 대로 검사하고, 디스크 기록과 sha256 계산은 스레드 풀에서 실행
+    """
+
+    def __init__(self, media_dir: str):
+        self.media_dir = media_dir
+        self.fields = {}
+        self.files = []            # [(filename, size, sha256)]
+        self.total = 0
+        self._name = None
+        self._filename = None
+        self._file = None
+        self._hash = None
+        self._size = 0
+        self._buf = bytearray()
+
+    async def handle(self, kind: str, value) -> None:
+        if kind == "headers":
+            await self._begin(value)
+        elif kind == "data":
+            await self._data(value)
+        elif kind == "end":
+            await self._end()
+
+    async def _begin(self, headers: dict) -> None:
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        self._filename = None
+        self._size = 0
+        self._buf = bytearray()
+        if filename is None:
+            return
+        # 지원하지 않는 형식은 본문을 받기 전에 거절
+        self._filename = os.path.basename(filename.decode("utf-8", "replace"))
+        if check_file_type(self._filename) == "unknown":
+            raise UploadRejected(f"지원하지 않는 파일 형식: {self._filename}", 415)
+        self._hash = hashlib.sha256()
+        self._file = await run_in_threadpool(open, self._part_path, "wb")
+
+    @property
+    def _part_path(self) -> str:
+        return os.path.join(self.media_dir, self._filename + ".part")
+
+    async def _data(self, data: bytes) -> None:
+        self._size += len(data)
+        if self._filename is None:
+            if self._size > UPLOAD_MAX_FIELD_BYTES:
+                raise UploadRejected(f"입력값이 너무 깁니다: {self._name}", 413)
+            self._buf += data
+            return
+        if self._size > UPLOAD_MAX_FILE_BYTES:
+            raise UploadRejected(f"파일 용량 초과: {self._filename} (최대 {_mb(UPLOAD_MAX_FILE_BYTES)}MB)", 413)
+        if self.total + self._size > UPLOAD_MAX_REQUEST_BYTES:
+            raise UploadRejected(f"요청 용량 초과 (최대 {_mb(UPLOAD_MAX_REQUEST_BYTES)}MB)", 413)
+        self._buf += data
+        if len(self._buf) >= UPLOAD_CHUNK_SIZE:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        data, self._buf = bytes(self._buf), bytearray()
+        if data:
+            await run_in_threadpool(_write_chunk, self._file, self._hash, data)
+
+    async def _end(self) -> None:
+        if self._filename is None:
+            self.fields[self._name] = self._buf.decode("utf-8", "replace")
+            return
+        await self._flush()
+        await run_in_threadpool(self._file.close)
+        self._file = None
+        await run_in_threadpool(os.replace, self._part_path, os.path.join(self.media_dir, self._filename))
+        self.total += self._size
+        self.files.append((self._filename, self._size, self._hash.hexdigest()))
+
+    def close(self) -> None:
+        """중단된 경우 열려 있는 임시 파일 정리"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if os.path.exists(self._part_path):
+                os.remove(self._part_path)
+
+
+def check_upload_request(request) -> bytes:
+    """
+    본문을 읽기 전에 헤더만으로 거절할 수 있는 요청을 걸러냄
+    (Content-Length가 UPLOAD_MAX_REQUEST_BYTES 초과 → 413, multipart가 아님 → 400). 반환: boundary
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > UPLOAD_MAX_REQUEST_BYTES:
+        raise UploadRejected(f"요청 용량 초과 (최대 {_mb(UPLOAD_MAX_REQUEST_BYTES)}MB)", 413)
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected("multipart/form-data 요청이어야 합니다.", 400)
+    return boundary
+
+
+async def receive_upload(request, boundary: bytes, media_dir: str) -> tuple:
+    """
+    요청 본문(multipart/form-data)을 request.stream()에서 받는 대로 파싱해
+    파일 파트는 media_dir에 청크 단위로 저장하고 나머지는 폼 필드로 모음.
+    반환: (fields {name: str}, files [(filename, size, sha256)])
+    """
+    # 파서 콜백은 동기 함수 → 이벤트만 쌓고, 청크마다 비동기로 처리
+    events = []
+    header = {"field": b"", "value": b"", "headers": {}}
+
+    def on_part_begin():
+        header["headers"] = {}
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        events.append(("headers", header["headers"]))
+
+    def on_part_data(data, start, end):
+        events.append(("data", data[start:end]))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    receiver = _UploadReceiver(media_dir)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, value in events:
+                await receiver.handle(kind, value)
+            events.clear()
+        parser.finalize()
+        for kind, value in events:
+            await receiver.handle(kind, value)
+    except MultipartParseError as e:
+        raise UploadRejected(f"잘못된 multipart 요청: {e}", 400)
+    finally:
+        receiver.close()
+    return receiver.fields, receiver.files
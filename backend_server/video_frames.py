@@ -0,0 +1,116 @@
+import os, time
+import cv2
+from image_prep import vision_size
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+# true면 균등 간격 대신 장면 전환(히스토그램 차이)이 큰 프레임을 키프레임으로 선택
+KEYFRAME_SCENE_DETECT = os.getenv("KEYFRAME_SCENE_DETECT", "false").lower() == "true"
+# 키프레임 1장당 후보 프레임 수 (후보 중에서 최종 키프레임을 고름)
+KEYFRAME_CANDIDATES = int(os.getenv("KEYFRAME_CANDIDATES", "4"))
+
+_HIST_SIZE = (64, 36)
+
+
+# ============================================================
+# 1️⃣ 후보 프레임 수집 (한 번의 순차 디코딩)
+# ============================================================
+def _frame_hist(frame):
+    """축소한 프레임의 H/S 히스토그램 (장면 전환 비교용)"""
+    small = cv2.resize(frame, _HIST_SIZE, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+
+def _collect_candidates(cap, stride: int, limit: int, with_hist: bool):
+    """
+    grab()으로 모든 프레임을 순서대로 넘기고 stride 간격에서만 retrieve().
+    CAP_PROP_FRAME_COUNT가 실제보다 작아 후보가 limit의 2배를 넘으면
+    절반을 버리고 간격을 2배로 늘려 메모리를 일정하게 유지합니다.
+    (이후 위치는 남은 후보 기준으로 다시 맞춰 전체 구간에서 간격이 고르게 유지됨)
+    """
+    candidates = []  # (frame_index, frame, hist)
+    idx = 0
+    next_idx = stride // 2
+    while cap.grab():
+        if idx == next_idx:
+            next_idx += stride
+            ok, frame = cap.retrieve()
+            if ok:
+                h, w = frame.shape[:2]
+                size = vision_size(w, h)
+                if size != (w, h):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                candidates.append((idx, frame, _frame_hist(frame) if with_hist else None))
+                if len(candidates) > limit * 2:
+                    candidates = candidates[::2]
+                    stride *= 2
+                    # 남은 후보와 같은 간격이 되도록 다음 위치를 마지막 후보 + 새 stride로 다시 맞춤
+                    next_idx = candidates[-1][0] + stride
+        idx += 1
+    return candidates, idx
+
+
+# ============================================================
+# 2️⃣ 키프레임 선택
+# ============================================================
+def _select_uniform(candidates, total: int, num_frames: int):
+    """실제 프레임 수 기준 균등 위치에 가장 가까운 후보 선택"""
+    chosen = []
+    for i in range(num_frames):
+        target = total * (i + 1) / (num_frames + 1)
+        best = min(candidates, key=lambda c: abs(c[0] - target))
+        if best not in chosen:
+            chosen.append(best)
+    return sorted(chosen, key=lambda c: c[0])
+
+
+def _select_scene_changes(candidates, num_frames: int):
+    """직전 후보와의 히스토그램 차이가 큰 순서로 선택 (첫 후보는 항상 포함)"""
+    scored = [(float("inf"), candidates[0])]
+    for prev, cur in zip(candidates, candidates[1:]):
+        diff = cv2.compareHist(prev[2], cur[2], cv2.HISTCMP_BHATTACHARYYA)
+        scored.append((diff, cur))
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return sorted((c for _, c in scored[:num_frames]), key=lambda c: c[0])
+
+
+def extract_keyframes(video_path: str, num_frames: int = 5, scene_detect: bool = None):
+    """
+    영상에서 num_frames개의 키프레임(BGR ndarray, Vision 해상도로 축소됨)을 추출.
+    반환: (frames, stats) — stats에는 디코딩한 프레임 수와 추출 시간(extract_sec) 포함
+    """
+    scene_detect = KEYFRAME_SCENE_DETECT if scene_detect is None else scene_detect
+    t0 = time.perf_counter()
+
+    cap = cv2.VideoCapture(video_path)
+    estimated = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if estimated <= 0:
+        # 프레임 수를 모르면 약 1초 간격으로 후보 수집
+        estimated = 0
+        stride = max(1, int(cap.get(cv2.CAP_PROP_FPS) or 30))
+    else:
+        stride = max(1, estimated // (num_frames * KEYFRAME_CANDIDATES))
+
+    try:
+        candidates, total = _collect_candidates(cap, stride, num_frames * KEYFRAME_CANDIDATES, scene_detect)
+    finally:
+        cap.release()
+
+    if not candidates:
+        frames = []
+    elif scene_detect:
+        frames = [c[1] for c in _select_scene_changes(candidates, num_frames)]
+    else:
+        frames = [c[1] for c in _select_uniform(candidates, total, num_frames)]
+
+    stats = {
+        "mode": "scene" if scene_detect else "uniform",
+        "frames": len(frames),
+        "decoded_frames": total,
+        "estimated_frames": estimated,
+        "extract_sec": round(time.perf_counter() - t0, 3),
+    }
+    return frames, stats
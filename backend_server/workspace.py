@@ -0,0 +1,125 @@
+import os, re, time, uuid, shutil
+
+# ============================================================
+# 0️⃣ 설정 (.env로 조정 가능)
+# ============================================================
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "workspaces")
+WORKSPACE_RETENTION_HOURS = float(os.getenv("WORKSPACE_RETENTION_HOURS", "24"))
+WORKSPACE_MAX_COUNT = int(os.getenv("WORKSPACE_MAX_COUNT", "50"))
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{12,32}$")
+
+
+# ============================================================
+# 1️⃣ 작업(job)별 작업 공간
+# ============================================================
+class Workspace:
+    """
+    업로드 1건 = 작업 공간 1개.
+    workspaces/<job_id>/
+      ├─ media/     업로드 원본 (이 작업의 파일만 분석)
+      └─ results/   analysis_result.json, timeline_debug.json, final_shorts.mp4 (변형은 final_shorts_v2.mp4 …)
+                    초안 모드: draft_shorts.mp4, contact_sheet.jpg, render_timeline.json(본 렌더링용)
+    """
+
+    def __init__(self, job_id: str, root: str = WORKSPACE_ROOT):
+        self.job_id = job_id
+        self.dir = os.path.join(root, job_id)
+        self.media_dir = os.path.join(self.dir, "media")
+        self.result_dir = os.path.join(self.dir, "results")
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.result_dir, "final_shorts.mp4")
+
+    @property
+    def output_url(self) -> str:
+        """StaticFiles(/workspaces) 기준 결과 영상 URL"""
+        return f"/workspaces/{self.job_id}/results/final_shorts.mp4"
+
+    def variant_output_path(self, index: int) -> str:
+        """변형 index(0부터)의 결과 영상 경로 (0번은 output_path와 같음)"""
+        if index == 0:
+            return self.output_path
+        return os.path.join(self.result_dir, f"final_shorts_v{index + 1}.mp4")
+
+    def variant_output_url(self, index: int) -> str:
+        if index == 0:
+            return self.output_url
+        return f"/workspaces/{self.job_id}/results/final_shorts_v{index + 1}.mp4"
+
+    @property
+    def draft_output_path(self) -> str:
+        return os.path.join(self.result_dir, "draft_shorts.mp4")
+
+    @property
+    def draft_output_url(self) -> str:
+        return f"/workspaces/{self.job_id}/results/draft_shorts.mp4"
+
+    @property
+    def contact_sheet_path(self) -> str:
+        return os.path.join(self.result_dir, "contact_sheet.jpg")
+
+    @property
+    def contact_sheet_url(self) -> str:
+        return f"/workspaces/{self.job_id}/results/contact_sheet.jpg"
+
+    @property
+    def render_timeline_path(self) -> str:
+        """초안 확인 후 본 렌더링에 다시 쓰는 타임라인"""
+        return os.path.join(self.result_dir, "render_timeline.json")
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.dir)
+
+
+def create_workspace(root: str = WORKSPACE_ROOT) -> Workspace:
+    ws = Workspace(uuid.uuid4().hex[:16], root)
+    os.makedirs(ws.media_dir, exist_ok=True)
+    os.makedirs(ws.result_dir, exist_ok=True)
+    return ws
+
+
+def get_workspace(job_id: str, root: str = WORKSPACE_ROOT):
+    """job_id로 작업 공간 조회 (형식이 다르거나 없으면 None, 경로 조작 방지)"""
+    if not job_id or not _JOB_ID_RE.match(job_id):
+        return None
+    ws = Workspace(job_id, root)
+    return ws if ws.exists() else None
+
+
+# ============================================================
+# 2️⃣ 보존 정책에 따른 정리
+# ============================================================
+def cleanup_workspaces(
+    root: str = WORKSPACE_ROOT,
+    retention_hours: float = WORKSPACE_RETENTION_HOURS,
+    max_count: int = WORKSPACE_MAX_COUNT,
+    keep: tuple = (),
+) -> list:
+    """
+    retention_hours보다 오래된 작업 공간을 삭제하고,
+    남은 개수가 max_count를 넘으면 오래된 순으로 추가 삭제. keep에 있는 job_id는 보존.
+    """
+    if not os.path.isdir(root):
+        return []
+
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and _JOB_ID_RE.match(name) and name not in keep:
+            entries.append((os.path.getmtime(path), name))
+    entries.sort(reverse=True)  # 최신순
+
+    now = time.time()
+    removed = []
+    for rank, (mtime, name) in enumerate(entries):
+        expired = retention_hours and now - mtime > retention_hours * 3600
+        overflow = max_count and rank >= max_count
+        if expired or overflow:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed.append(name)
+
+    if removed:
+        print(f"🧹 작업 공간 정리: {len(removed)}개 삭제")
+    return removed